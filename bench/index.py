@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: set sw=4 ts=4 sts=4 et tw=80 fdm=indent :
+#
+# Copyright (c) 2026 Ali Polatel <alip@exherbo.org>
+#
+# This file is part of the paludis-utils. paludis-utils is free software; you
+# can redistribute it and/or modify it under the terms of the GNU General
+# Public License version 2, as published by the Free Software Foundation.
+#
+# paludis-utils is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 59 Temple
+# Place, Suite 330, Boston, MA  02111-1307  USA
+
+"""Benchmark building, saving and querying the trigram index.
+
+Usage: bench/index.py [-n PATHS] [-p MATCHER:PATTERN]...
+A synthetic index of PATHS paths in packages of 100 paths is built and
+saved to a temporary file, then every pattern is looked up in the mapped
+index after opening it afresh, as a pbelongs -I run would.
+"""
+
+from __future__ import print_function
+
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from optparse import OptionParser
+
+TOPDIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, TOPDIR)
+
+from putils.index import TrigramIndex, load_index
+from putils.pattern import path_matcher, pattern_literals
+
+DEFAULT_PATTERNS = [ "exact:/usr/lib/pkg123/file45.so",
+        "fnmatch:*/pkg4567/*", "regex:file9[0-9]\\.py$", "simple:share/doc" ]
+
+def synthetic_index(path_count):
+    """Return a finished TrigramIndex of path_count made up paths."""
+    random.seed(0)
+    index = TrigramIndex()
+    top = [ "/usr/bin", "/usr/lib", "/usr/share/doc", "/usr/include", "/etc" ]
+    for package in xrange((path_count + 99) // 100):
+        name = "pkg%d" % package
+        paths = [ "%s/%s/file%d.%s" % (random.choice(top), name, i,
+            random.choice([ "so", "py", "h", "txt", "conf" ]))
+            for i in xrange(100) ]
+        index.add("cat%d/%s-1.0:0::installed" % (package % 50, name), paths)
+    index.finish()
+    return index
+
+def main():
+    parser = OptionParser(usage = "%prog [-n PATHS] [-p MATCHER:PATTERN]...")
+    parser.add_option("-n", "--paths", type = "int", dest = "paths",
+            default = 900000, help = "Number of paths, default: %default")
+    parser.add_option("-p", "--pattern", action = "append", dest = "patterns",
+            metavar = "MATCHER:PATTERN",
+            help = "Pattern to look up, MATCHER is exact, simple, fnmatch or regex")
+    options, args = parser.parse_args()
+
+    start = time.time()
+    index = synthetic_index(options.paths)
+    print("build %.2fs" % (time.time() - start))
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmpdir, "trigrams.index")
+        start = time.time()
+        index.save(path, "bench")
+        print("save  %.2fs, %.1f MB" % (time.time() - start,
+            os.path.getsize(path) / 1048576.0))
+
+        for spec in options.patterns or DEFAULT_PATTERNS:
+            matcher, pattern = spec.split(":", 1)
+            match = path_matcher(pattern, matcher, False)
+            literals = pattern_literals(pattern, matcher)
+            start = time.time()
+            mapped = load_index(path, "bench")
+            owners = mapped.owning_packages(match, literals)
+            elapsed = time.time() - start
+            mapped.close()
+            expected = index.owning_packages(match, literals)
+            if owners != expected:
+                print("%s: %d owners, expected %d" % (spec, len(owners),
+                    len(expected)), file = sys.stderr)
+            print("%-8s %-32s %5d owners %.4fs" % (matcher, pattern,
+                len(owners), elapsed))
+    finally:
+        shutil.rmtree(tmpdir)
+
+if __name__ == '__main__':
+    main()
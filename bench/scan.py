@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: set sw=4 ts=4 sts=4 et tw=80 fdm=indent :
+#
+# Copyright (c) 2026 Ali Polatel <alip@exherbo.org>
+#
+# This file is part of the paludis-utils. paludis-utils is free software; you
+# can redistribute it and/or modify it under the terms of the GNU General
+# Public License version 2, as published by the Free Software Foundation.
+#
+# paludis-utils is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 59 Temple
+# Place, Suite 330, Boston, MA  02111-1307  USA
+
+"""Benchmark matching paths against patterns as content scans do.
+
+Usage: bench/scan.py [-n REPEAT] [-p MATCHER:PATTERN]... [DIRECTORY|FILE]...
+Paths are collected from DIRECTORY trees, or read one per line from FILE,
+e.g. the output of "p pcontents -M '*/*' | cut -f3". Each pattern is matched
+against every path, case sensitively and ignoring case, both with plain
+re/fnmatch calls as content scans used to do and with
+putils.pattern.path_matcher().
+"""
+
+from __future__ import print_function
+
+import fnmatch
+import os
+import re
+import sys
+import time
+from optparse import OptionParser
+
+TOPDIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, TOPDIR)
+
+from putils.pattern import path_matcher
+
+DEFAULT_PATTERNS = [ "fnmatch:*.so", "fnmatch:/usr/share/*",
+        "fnmatch:*/bin/*", "regex:\\.py$", "regex:lib.*\\.so\\.[0-9]+$",
+        "regex:python", "regex:(foo|bar)baz" ]
+
+def read_paths(args):
+    """Collect paths from directories and files in args."""
+    paths = []
+    for arg in args:
+        if os.path.isdir(arg):
+            for dirpath, dirnames, filenames in os.walk(arg):
+                paths.extend(os.path.join(dirpath, name)
+                        for name in dirnames + filenames)
+        else:
+            with open(arg) as f:
+                paths.extend(line.rstrip("\n") for line in f)
+    return paths
+
+def plain_matcher(pattern, matcher, ignore_case):
+    """Return a matcher like the one content scans used before
+    path_matcher(), translating fnmatch patterns on every call."""
+    if matcher == "fnmatch":
+        if ignore_case:
+            return lambda path: fnmatch.fnmatch(path.lower(), pattern.lower())
+        return lambda path: fnmatch.fnmatchcase(path, pattern)
+    if ignore_case:
+        return lambda path: re.search(pattern, path, re.IGNORECASE) is not None
+    return lambda path: re.search(pattern, path) is not None
+
+def best_time(function, paths, repeat):
+    """Return the number of matches and the best time of repeat runs."""
+    best = None
+    for i in range(repeat):
+        start = time.time()
+        count = sum(1 for path in paths if function(path))
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return count, best
+
+def main():
+    parser = OptionParser(usage = "%prog [-n REPEAT] [-p MATCHER:PATTERN]... [DIRECTORY|FILE]...")
+    parser.add_option("-n", "--repeat", type = "int", dest = "repeat",
+            default = 3, help = "Number of runs per pattern, default: %default")
+    parser.add_option("-p", "--pattern", action = "append", dest = "patterns",
+            metavar = "MATCHER:PATTERN",
+            help = "Pattern to benchmark, MATCHER is fnmatch or regex")
+    options, args = parser.parse_args()
+
+    paths = read_paths(args or [ "/usr" ])
+    print("%d paths" % len(paths))
+    for spec in options.patterns or DEFAULT_PATTERNS:
+        matcher, pattern = spec.split(":", 1)
+        for ignore_case in (False, True):
+            plain_count, plain = best_time(plain_matcher(pattern, matcher,
+                ignore_case), paths, options.repeat)
+            count, compiled = best_time(path_matcher(pattern, matcher,
+                ignore_case), paths, options.repeat)
+            if count != plain_count:
+                print("%s: %d matches, expected %d" % (spec, count,
+                    plain_count), file = sys.stderr)
+            print("%-8s %-28s %-6s plain %.3fs compiled %.3fs (%.1fx)" %
+                    (matcher, pattern, ignore_case and "-i" or "", plain,
+                        compiled, plain / max(compiled, 1e-6)))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: set sw=4 ts=4 sts=4 et tw=80 fdm=indent :
+#
+# Copyright (c) 2026 Ali Polatel <alip@exherbo.org>
+#
+# This file is part of the paludis-utils. paludis-utils is free software; you
+# can redistribute it and/or modify it under the terms of the GNU General
+# Public License version 2, as published by the Free Software Foundation.
+#
+# paludis-utils is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 59 Temple
+# Place, Suite 330, Boston, MA  02111-1307  USA
+
+"""Benchmark time to first output of the p script.
+
+Usage: bench/startup.py [-n REPEAT] [-q QUERY]...
+QUERY is a command line for p, e.g. -q "pquery --log-level silent foo/bar".
+The default query, pquery for a nonexistent package, needs paludis but no
+network access.
+"""
+
+from __future__ import print_function
+
+import os
+import sys
+import time
+from optparse import OptionParser
+from subprocess import Popen, PIPE
+
+TOPDIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+P = os.path.join(TOPDIR, "scripts", "p")
+
+DEFAULT_COMMANDS = [ "--help", "pquery --help",
+        "pquery --log-level silent does-not/exist" ]
+
+def time_to_first_output(argv):
+    """Run argv and return the seconds until the first byte of output and
+    until the process exits."""
+    env = os.environ.copy()
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, (TOPDIR,
+        env.get("PYTHONPATH"))))
+
+    start = time.time()
+    proc = Popen(argv, stdout = PIPE, stderr = PIPE, env = env)
+    proc.stdout.read(1)
+    first_output = time.time() - start
+    proc.communicate()
+    return first_output, time.time() - start
+
+def main():
+    parser = OptionParser(usage = "%prog [-n REPEAT] [-q QUERY]...")
+    parser.add_option("-n", "--repeat", type = "int", dest = "repeat",
+            default = 10, help = "Number of runs per command, default: %default")
+    parser.add_option("-q", "--query", action = "append", dest = "commands",
+            metavar = "QUERY", help = "p command line to benchmark")
+    options, args = parser.parse_args()
+
+    for command in options.commands or DEFAULT_COMMANDS:
+        argv = [ sys.executable, P ] + command.split()
+        runs = sorted(time_to_first_output(argv) for i in range(options.repeat))
+        firsts = sorted(run[0] for run in runs)
+        totals = sorted(run[1] for run in runs)
+        print("p %-40s first output: min %.3fs median %.3fs, exit: median %.3fs" %
+                (command, firsts[0], firsts[len(firsts) // 2],
+                    totals[len(totals) // 2]))
+
+if __name__ == '__main__':
+    main()
@@ -29,6 +29,7 @@ __copyright__ = __name__ + " comes with ABSOLUTELY NO WARRANTY. " +\
         "and you are welcome to redistribute it under the terms of " +\
         "the GNU General Public License, version 2."
 
-__all__ = [ "applets", "colours", "common", "getopt", "content", "remote",
-        "user", "util" ]
+__all__ = [ "applets", "bloom", "colours", "common", "complete", "getopt",
+        "content", "fleet", "index", "inotify", "parallel", "pattern",
+        "querycache", "remote", "snapshot", "timing", "user", "util", "vdb" ]
 
@@ -20,4 +20,43 @@
 """Applets for paludis-utils
 """
 
-__all__ = [ "pquery" ]
+__all__ = [ "pbatch", "pbelongs", "pcollisions", "pcontents", "pdu", "pfleet",
+        "plinkage", "porphans", "pquery", "psnapshot", "pverify" ]
+
+def get_applet(name):
+    """Get applet by name."""
+    try:
+        applet = __import__("putils.applets", globals(), locals(), [name])
+        applet = getattr(applet, name)
+    except (AttributeError, ImportError):
+        return None
+
+    return applet
+
+def scan_usage(path):
+    """Get the usage string of an applet by parsing its source.
+    Unlike importing the applet, this doesn't import paludis."""
+    import ast
+
+    with open(path, "r") as f:
+        tree = ast.parse(f.read(), path)
+
+    for node in tree.body:
+        if (isinstance(node, ast.Assign) and isinstance(node.value, ast.Str)
+                and any(isinstance(target, ast.Name) and target.id == "usage"
+                    for target in node.targets)):
+            return node.value.s
+    return None
+
+def get_usages():
+    """Return a list of (applet name, usage string) tuples.
+    Uses the manifest generated at build time if it's available and falls
+    back to parsing the applets' sources."""
+    try:
+        from putils.applets.manifest import APPLETS
+    except ImportError:
+        import os
+        dname = os.path.dirname(os.path.abspath(__file__))
+        APPLETS = [ (name, scan_usage(os.path.join(dname, name + ".py")))
+                for name in __all__ ]
+    return APPLETS
@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: set sw=4 ts=4 sts=4 et tw=80 fdm=indent :
+#
+# Copyright (c) 2026 Ali Polatel <alip@exherbo.org>
+#
+# This file is part of the paludis-utils. paludis-utils is free software; you
+# can redistribute it and/or modify it under the terms of the GNU General
+# Public License version 2, as published by the Free Software Foundation.
+#
+# paludis-utils is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 59 Temple
+# Place, Suite 330, Boston, MA  02111-1307  USA
+
+"""Run many applet command lines in one process
+"""
+
+from __future__ import print_function
+
+import shlex
+import sys
+import traceback
+from optparse import OptionGroup
+
+from putils.getopt import PaludisOptionParser
+
+__all__ = [ "main", "usage" ]
+
+usage = """%prog [options] [file...]
+Run applet command lines read from files or standard input"""
+
+def parse_command_line():
+    """Parse command line options."""
+
+    parser = PaludisOptionParser()
+    parser.usage = usage
+
+    ogroup = OptionGroup(parser, "Output Options")
+    ogroup.add_option("-d", "--delimiter", dest = "delimiter", default = "---",
+            metavar = "STRING",
+            help = "Line printed after the output of every command, followed by its exit status. Default: %default")
+    ogroup.add_option("-0", "--null", action = "store_true", dest = "null",
+            default = False,
+            help = "Terminate the output of every command with a NUL character instead of a delimiter line")
+    parser.add_option_group(ogroup)
+
+    parser.epilog = " ".join((parser.epilog, "Every input line is an applet",
+        "command line, e.g. 'pquery foo/bar'. Empty lines and lines starting",
+        "with # are skipped. Environments and caches are shared by all",
+        "commands, --environment is passed to commands that don't specify",
+        "one."))
+
+    return parser.parse_args()
+
+def run_command(argv):
+    """Run applet command line argv in this process.
+    Returns the exit status of the applet."""
+    from putils.applets import get_applet
+
+    applet_name = argv[0]
+    applet = get_applet(applet_name)
+    if applet is None or applet_name == "pbatch":
+        print("No such applet", applet_name, file=sys.stderr)
+        return 1
+
+    saved_argv = sys.argv
+    sys.argv = argv
+    try:
+        try:
+            status = applet.main()
+        except SystemExit as err:
+            status = err.code
+        except Exception:
+            traceback.print_exc()
+            status = 1
+    finally:
+        sys.argv = saved_argv
+        sys.stdout.flush()
+
+    if status is None:
+        return 0
+    elif isinstance(status, int):
+        return status
+    else:
+        # sys.exit("message")
+        print(status, file=sys.stderr)
+        return 1
+
+def read_commands(files, failed):
+    """Yield command lines from files, - is standard input.
+    Files which can't be read are reported and appended to failed."""
+    for filename in files or [ "-" ]:
+        try:
+            if filename == "-":
+                f = sys.stdin
+            else:
+                f = open(filename, "r")
+        except IOError, e:
+            print(e, file=sys.stderr)
+            failed.append(filename)
+            continue
+        try:
+            for line in iter(f.readline, ""):
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    yield line
+        finally:
+            if f is not sys.stdin:
+                f.close()
+
+def main():
+    options, args = parse_command_line()
+
+    from putils.util import disable_pager
+    disable_pager()
+
+    # Commands parse their own -E options, abbreviations included, and
+    # fall back to ours
+    PaludisOptionParser.default_environments = [ options.environment ]
+
+    status = 0
+    failed = []
+    for line in read_commands(args, failed):
+        try:
+            argv = shlex.split(line)
+        except ValueError, e:
+            # e.g. an unbalanced quote, fail this command only
+            print("Invalid command line: %s: %s" % (line, e), file=sys.stderr)
+            command_status = 1
+        else:
+            if argv[0] == "p":
+                argv = argv[1:]
+            if not argv:
+                continue
+
+            command_status = run_command(argv)
+        if command_status != 0:
+            status = 1
+
+        if options.null:
+            sys.stdout.write("\0")
+        else:
+            print(options.delimiter, command_status)
+        sys.stdout.flush()
+
+    if failed:
+        status = 1
+    return status
+
+if __name__ == '__main__':
+    main()
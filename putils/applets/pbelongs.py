@@ -0,0 +1,246 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: set sw=4 ts=4 sts=4 et tw=80 fdm=indent :
+#
+# Copyright (c) 2026 Ali Polatel <alip@exherbo.org>
+#
+# This file is part of the paludis-utils. paludis-utils is free software; you
+# can redistribute it and/or modify it under the terms of the GNU General
+# Public License version 2, as published by the Free Software Foundation.
+#
+# paludis-utils is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 59 Temple
+# Place, Suite 330, Boston, MA  02111-1307  USA
+
+"""Find the installed packages owning files
+"""
+
+from __future__ import print_function
+
+import os
+import sys
+from optparse import OptionGroup
+
+from putils.getopt import PaludisOptionParser
+from putils.timing import timings
+from putils.util import Output, PagerClosed, get_environment
+
+__all__ = [ "main", "usage" ]
+
+usage = """%prog [options] <path>...
+Find the installed packages owning files"""
+
+def parse_command_line():
+    """Parse command line options."""
+
+    parser = PaludisOptionParser()
+    parser.usage = usage
+
+    parser.add_default_format_options()
+    parser.add_default_content_limit_options()
+
+    mgroup = OptionGroup(parser, "Matching Options")
+    mgroup.add_option("-m", "--matcher", type = "choice",
+            choices = [ "exact", "simple", "fnmatch", "regex" ],
+            dest = "matcher", default = "exact",
+            help = "How to match paths. One of: exact, simple, fnmatch, regex. Default: %default")
+    mgroup.add_option("-i", "--ignore-case", action = "store_true",
+            dest = "ignore_case", default = False,
+            help = "Ignore case distinctions with fnmatch and regex matchers")
+    mgroup.add_option("-I", "--index", action = "store_true", dest = "index",
+            default = False,
+            help = "Use the trigram index of installed paths to find the owning packages, building it if it is missing or out of date")
+    parser.add_option_group(mgroup)
+
+    cgroup = OptionGroup(parser, "Cache Options")
+    cgroup.add_option("", "--no-cache", action = "store_false", dest = "cache",
+            default = True,
+            help = "Don't use cached results or the Bloom filters of installed paths, parse the contents of every package")
+    parser.add_option_group(cgroup)
+
+    wgroup = OptionGroup(parser, "Watch Options")
+    wgroup.add_option("-w", "--watch", action = "store_true", dest = "watch",
+            default = False,
+            help = "Keep running and answer paths read from standard input, watching the installed database with inotify so packages installed or uninstalled meanwhile are seen")
+    parser.add_option_group(wgroup)
+
+    parser.epilog = " ".join((parser.epilog, "If no path or - is given,",
+        "paths are read from standard input, one per line. If more than one",
+        "--environment is given, they are searched concurrently and every",
+        "line is prefixed with the root of the environment. Results are",
+        "cached until a package is installed or uninstalled. Exact paths are",
+        "first checked against Bloom filters of the paths installed by",
+        "every package, which are cached and rebuilt when its CONTENTS file",
+        "changes. With --watch, owners of every path are followed by an",
+        "empty line."))
+
+    return parser.parse_args()
+
+def read_paths(args):
+    """Yield paths from args, - or no arguments mean standard input."""
+    for arg in args or [ "-" ]:
+        if arg == "-":
+            for line in iter(sys.stdin.readline, ""):
+                line = line.rstrip("\n")
+                if line:
+                    yield line
+        else:
+            yield arg
+
+def search(options, paths, outfd):
+    """Search paths in the environment and write owners to outfd.
+    Returns the set of paths found."""
+    from putils.content import search_contents_many
+
+    with timings.phase("environment"):
+        env = get_environment(options.environment)
+
+    if options.colour and outfd.isatty():
+        from putils.colours import colourify_content
+    else:
+        from putils.colours import no_colourify_content as colourify_content
+
+    index = None
+    if options.index:
+        from putils.index import get_index
+        with timings.phase("index"):
+            index = get_index(env)
+
+    filters = None
+    if options.cache and options.matcher == "exact":
+        from putils.bloom import ContentsFilters
+        with timings.phase("filters"):
+            filters = ContentsFilters(env)
+
+    cache = None
+    if options.cache:
+        from putils.querycache import QueryCache
+        with timings.phase("cache"):
+            cache = QueryCache(env)
+
+    found = set()
+    for path, package_id, content in timings.iterate("contents",
+            search_contents_many(paths, env, options.matcher,
+                options.ignore_case, options.requested_instances, index,
+                filters, cache)):
+        found.add(path)
+        with timings.phase("output"):
+            print(package_id, colourify_content(content, env.root),
+                    file=outfd)
+    return found
+
+def search_roots(options, paths, outfd):
+    """Search paths in all environments concurrently and write owners to
+    outfd, tagged with the root of the environment.
+    Returns the set of paths found."""
+    from putils.content import content_type_names, search_contents_records
+    from putils.parallel import map_environments
+
+    found = set()
+    for spec, root, records in timings.iterate("contents",
+            map_environments(search_contents_records, options.environments,
+                paths, options.matcher, options.ignore_case,
+                content_type_names(options.requested_instances),
+                options.index, options.cache and options.matcher == "exact",
+                options.cache)):
+        for path, (package, content_type, content_path, target) in records:
+            found.add(path)
+            print(root, package, content_path, sep="\t", file=outfd)
+    return found
+
+def answer(options, type_names, owner_map, path, outfd):
+    """Write the owners of path in owner_map to outfd followed by an empty
+    line. Returns True if path is owned by any package."""
+    records = owner_map.lookup(path, options.matcher, options.ignore_case,
+            type_names)
+    for package, content_type, content_path, target in records:
+        print(package, content_path, file=outfd)
+    print(file=outfd)
+    outfd.flush()
+    return bool(records)
+
+def watch(options, args):
+    """Answer queries from args and standard input until it is closed,
+    keeping an owner map current with inotify, see putils.vdb.OwnerMap."""
+    from select import select
+    from putils.content import content_type_names
+    from putils.vdb import OwnerMap, installed_repositories
+
+    env = get_environment(options.environment)
+    type_names = content_type_names(options.requested_instances)
+
+    owner_map = OwnerMap(installed_repositories(env), env.root)
+    try:
+        owner_map.watch()
+    except OSError, e:
+        print("Can't watch the installed database:", e.strerror,
+                file=sys.stderr)
+        return 1
+    with timings.phase("load"):
+        owner_map.load()
+
+    outfd = sys.stdout
+    for arg in args:
+        if arg != "-":
+            owner_map.process_events()
+            answer(options, type_names, owner_map, arg, outfd)
+
+    fd = sys.stdin.fileno()
+    pending = ""
+    while True:
+        readable = select([ fd, owner_map ], [], [])[0]
+        if owner_map in readable:
+            owner_map.process_events()
+        if fd not in readable:
+            continue
+
+        data = os.read(fd, 65536)
+        if not data:
+            break
+        lines = (pending + data).split("\n")
+        pending = lines.pop()
+        # Apply changes that happened before the query was read
+        owner_map.process_events()
+        for line in lines:
+            if line:
+                answer(options, type_names, owner_map, line, outfd)
+    if pending:
+        owner_map.process_events()
+        answer(options, type_names, owner_map, pending, outfd)
+
+    owner_map.close()
+    return 0
+
+def main():
+    options, args = parse_command_line()
+
+    if options.watch:
+        return watch(options, args)
+
+    paths = list(read_paths(args))
+    if not paths:
+        return 0
+
+    outfd = Output()
+    found = set()
+    try:
+        if len(options.environments) > 1:
+            found = search_roots(options, paths, outfd)
+        else:
+            found = search(options, paths, outfd)
+    except PagerClosed:
+        pass
+    outfd.close()
+
+    # Like grep, fail if some paths aren't owned by any package.
+    if len(found) != len(set(paths)):
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: set sw=4 ts=4 sts=4 et tw=80 fdm=indent :
+#
+# Copyright (c) 2026 Ali Polatel <alip@exherbo.org>
+#
+# This file is part of the paludis-utils. paludis-utils is free software; you
+# can redistribute it and/or modify it under the terms of the GNU General
+# Public License version 2, as published by the Free Software Foundation.
+#
+# paludis-utils is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 59 Temple
+# Place, Suite 330, Boston, MA  02111-1307  USA
+
+"""Find paths installed by more than one package
+"""
+
+from __future__ import print_function
+
+import os
+import shutil
+import tempfile
+import zlib
+from optparse import OptionGroup
+
+from putils.getopt import PaludisOptionParser
+from putils.timing import timings
+from putils.util import Output, PagerClosed, get_environment, rootjoin
+
+__all__ = [ "main", "usage" ]
+
+usage = """%prog [options] [<package>...]
+Find paths installed by more than one package"""
+
+def parse_command_line():
+    """Parse command line options."""
+
+    parser = PaludisOptionParser()
+    parser.usage = usage
+
+    ogroup = OptionGroup(parser, "Output Options")
+    ogroup.add_option("-M", "--machine-readable", action = "store_true",
+            dest = "machine_readable", default = False,
+            help = "Print path, package and type separated by tabs, one line per owner")
+    ogroup.add_option("-d", "--directories", action = "store_true",
+            dest = "directories", default = False,
+            help = "Report directories shared by packages as well")
+    parser.add_option_group(ogroup)
+
+    mgroup = OptionGroup(parser, "Memory Options")
+    mgroup.add_option("", "--max-paths", type = "int", dest = "max_paths",
+            default = 2000000, metavar = "N",
+            help = "Spill paths to temporary files once more than N are held in memory. Default: %default")
+    mgroup.add_option("", "--shards", type = "int", dest = "shards",
+            default = 16, metavar = "N",
+            help = "Number of temporary files to spill to, each is checked on its own. Default: %default")
+    parser.add_option_group(mgroup)
+
+    parser.epilog = " ".join((parser.epilog, "Contents of all installed",
+        "packages, or of the given packages, are read once. Different slots",
+        "of a package are different owners. Exits with status 1 if",
+        "collisions were found. Spilled paths are reported in shard order."))
+
+    return parser.parse_args()
+
+class CollisionMap(object):
+    """Map from paths to their owners.
+    Once more than max_paths paths are in memory, they and all paths added
+    later are written to shards temporary files by a hash of the path, so
+    every shard can be checked on its own with bounded memory."""
+
+    def __init__(self, max_paths=2000000, shards=16):
+        self.max_paths = max_paths
+        self.shard_count = max(shards, 1)
+        self.owners = dict()
+        self.spill_dir = None
+        self.shards = None
+
+    def add(self, package, entries):
+        """Add (path, type) entries installed by package."""
+        if self.shards is not None:
+            self._write(package, entries)
+            return
+
+        owners = self.owners
+        for path, entry_type in entries:
+            owner = (package, entry_type)
+            found = owners.get(path)
+            if found is None:
+                owners[path] = (owner,)
+            elif owner not in found:
+                owners[path] = found + (owner,)
+
+        if len(owners) > self.max_paths:
+            self._spill()
+
+    def _spill(self):
+        self.spill_dir = tempfile.mkdtemp(prefix = "pcollisions-")
+        self.shards = [ open(os.path.join(self.spill_dir, str(shard)), "wb")
+                for shard in xrange(self.shard_count) ]
+        for path, owners in self.owners.iteritems():
+            shard = self.shards[zlib.crc32(path) % self.shard_count]
+            for package, entry_type in owners:
+                shard.write("%s\0%s\0%s\n" % (path, package, entry_type))
+        self.owners = dict()
+
+    def _write(self, package, entries):
+        shards = self.shards
+        count = self.shard_count
+        for path, entry_type in entries:
+            shards[zlib.crc32(path) % count].write("%s\0%s\0%s\n" % (path,
+                package, entry_type))
+
+    def _read(self, shard):
+        owners = dict()
+        with open(shard.name, "rb") as f:
+            for line in f:
+                path, package, entry_type = line.rstrip("\n").split("\0")
+                owner = (package, entry_type)
+                found = owners.get(path)
+                if found is None:
+                    owners[path] = (owner,)
+                elif owner not in found:
+                    owners[path] = found + (owner,)
+        return owners
+
+    def _collisions(self, owners, directories):
+        for path in sorted(owners):
+            found = owners[path]
+            if len(found) < 2:
+                continue
+            if not directories and all(entry_type == "dir" for package,
+                    entry_type in found):
+                continue
+            yield path, found
+
+    def collisions(self, directories=False):
+        """Yield (path, ((package, type), ...)) for paths with more than
+        one owner. Paths owned as a directory by all owners are skipped
+        unless directories is True."""
+        if self.shards is None:
+            for collision in self._collisions(self.owners, directories):
+                yield collision
+            return
+
+        for shard in self.shards:
+            shard.close()
+        for shard in self.shards:
+            for collision in self._collisions(self._read(shard),
+                    directories):
+                yield collision
+
+    def close(self):
+        """Remove temporary files."""
+        if self.spill_dir is not None:
+            for shard in self.shards:
+                shard.close()
+            shutil.rmtree(self.spill_dir, True)
+            self.spill_dir = self.shards = None
+
+def installed_entries(env, packages):
+    """Yield (package id string, [ (path, type) ]) for installed packages
+    matching packages, or all of them."""
+    from putils.content import content_type, get_contents
+
+    for package in packages or [ "*/*" ]:
+        for package_id, contents in get_contents(package, env):
+            yield str(package_id), [ (rootjoin(
+                content.location_key().parse_value(), env.root),
+                content_type(content)) for content in contents ]
+
+def main():
+    options, args = parse_command_line()
+
+    with timings.phase("environment"):
+        env = get_environment(options.environment)
+
+    collision_map = CollisionMap(options.max_paths, options.shards)
+    found = False
+    outfd = Output()
+    try:
+        for package, entries in timings.iterate("contents",
+                installed_entries(env, args)):
+            collision_map.add(package, entries)
+
+        for path, owners in timings.iterate("collisions",
+                collision_map.collisions(options.directories)):
+            found = True
+            if options.machine_readable:
+                for package, entry_type in owners:
+                    print(path, package, entry_type, sep="\t", file=outfd)
+            else:
+                print(path, file=outfd)
+                for package, entry_type in owners:
+                    print("   ", package, entry_type, file=outfd)
+    except PagerClosed:
+        pass
+    finally:
+        collision_map.close()
+
+    status = outfd.close()
+    if found:
+        return 1
+    return status
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: set sw=4 ts=4 sts=4 et tw=80 fdm=indent :
+#
+# Copyright (c) 2026 Ali Polatel <alip@exherbo.org>
+#
+# This file is part of the paludis-utils. paludis-utils is free software; you
+# can redistribute it and/or modify it under the terms of the GNU General
+# Public License version 2, as published by the Free Software Foundation.
+#
+# paludis-utils is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 59 Temple
+# Place, Suite 330, Boston, MA  02111-1307  USA
+
+"""List contents of installed packages
+"""
+
+from __future__ import print_function
+
+from optparse import OptionGroup
+
+from putils.getopt import PaludisOptionParser
+from putils.timing import timings
+from putils.util import Output, get_environment
+
+__all__ = [ "main", "usage" ]
+
+usage = """%prog [options] <pkgname>...
+List contents of installed packages"""
+
+def parse_command_line():
+    """Parse command line options."""
+
+    parser = PaludisOptionParser()
+    parser.usage = usage
+
+    parser.add_default_format_options()
+    parser.add_default_query_options()
+    parser.add_default_content_limit_options()
+
+    ogroup = OptionGroup(parser, "Output Options")
+    ogroup.add_option("-M", "--machine-readable", action = "store_true",
+            dest = "machine_readable", default = False,
+            help = "Print package, type, path and symlink target separated by tabs")
+    ogroup.add_option("-0", "--null", action = "store_true", dest = "null",
+            default = False,
+            help = "Terminate entries with a NUL character instead of a newline")
+    ogroup.add_option("-r", "--repository", action = "append",
+            dest = "source_repos", default = [], metavar = "REPOSITORY",
+            help = "List only packages installed from REPOSITORY, may be given more than once")
+    parser.add_option_group(ogroup)
+
+    cgroup = OptionGroup(parser, "Cache Options")
+    cgroup.add_option("", "--no-cache", action = "store_false", dest = "cache",
+            default = True,
+            help = "Don't use cached results, parse the contents of every package")
+    parser.add_option_group(cgroup)
+
+    parser.epilog = " ".join((parser.epilog, "If more than one",
+        "--environment is given, they are listed concurrently and every line",
+        "is prefixed with the root of the environment. Results are cached",
+        "until a package is installed or uninstalled."))
+
+    options, args = parser.parse_args()
+
+    # Check if any positional arguments are specified
+    if not args:
+        parser.error("No package specified")
+
+    return options, args
+
+def machine_readable(record):
+    """Format a content record as a tab separated line."""
+    return "\t".join(field for field in record if field is not None)
+
+def roots_contents(options, args):
+    """List contents in all environments concurrently.
+    Yields lines prefixed with the root of the environment."""
+    from putils.content import content_type_names, get_contents_records
+    from putils.parallel import map_environments
+
+    for spec, root, records in timings.iterate("contents",
+            map_environments(get_contents_records, options.environments,
+                args, options.source_repos,
+                content_type_names(options.requested_instances),
+                options.selection.__name__, options.fnpattern, options.regexp,
+                options.ignore_case, options.index, options.cache)):
+        for record in records:
+            if options.machine_readable:
+                yield root + "\t" + machine_readable(record)
+            else:
+                yield root + "\t" + record[2]
+
+def main():
+    options, args = parse_command_line()
+
+    from putils.content import content_record, get_contents
+
+    outfd = Output()
+    if options.null:
+        end = "\0"
+    else:
+        end = "\n"
+
+    if len(options.environments) > 1:
+        outfd.stream(roots_contents(options, args), end)
+        return outfd.close()
+
+    with timings.phase("environment"):
+        env = get_environment(options.environment)
+
+    index = None
+    if options.index and (options.fnpattern or options.regexp):
+        from putils.index import get_index
+        with timings.phase("index"):
+            index = get_index(env)
+
+    cache = None
+    if options.cache:
+        from putils.querycache import QueryCache
+        with timings.phase("cache"):
+            cache = QueryCache(env)
+
+    def contents():
+        for package in args:
+            for package_id, requested_contents in get_contents(package, env,
+                    options.source_repos, options.requested_instances,
+                    options.selection, options.fnpattern, options.regexp,
+                    options.ignore_case, index, cache):
+                for content in requested_contents:
+                    yield package_id, content
+
+    if options.machine_readable:
+        lines = (machine_readable(content_record(package_id, content,
+                    env.root)) for package_id, content in
+                timings.iterate("contents", contents()))
+    elif options.colour and not options.null and outfd.isatty():
+        from putils.colours import colourify_many
+        lines = colourify_many((content for package_id, content in
+                timings.iterate("contents", contents())), env.root)
+    else:
+        from putils.colours import no_colourify_content
+        lines = (no_colourify_content(content, env.root)
+                for package_id, content in
+                timings.iterate("contents", contents()))
+
+    outfd.stream(lines, end)
+    return outfd.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,226 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: set sw=4 ts=4 sts=4 et tw=80 fdm=indent :
+#
+# Copyright (c) 2026 Ali Polatel <alip@exherbo.org>
+#
+# This file is part of the paludis-utils. paludis-utils is free software; you
+# can redistribute it and/or modify it under the terms of the GNU General
+# Public License version 2, as published by the Free Software Foundation.
+#
+# paludis-utils is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 59 Temple
+# Place, Suite 330, Boston, MA  02111-1307  USA
+
+"""Disk usage of installed packages
+"""
+
+from __future__ import print_function
+
+import heapq
+import os
+from hashlib import sha1
+from itertools import islice
+from optparse import OptionGroup
+
+from putils.getopt import PaludisOptionParser
+from putils.timing import timings
+from putils.util import (Output, PagerClosed, get_cache_dir, get_environment,
+        load_cache, rootjoin, save_cache)
+
+__all__ = [ "main", "usage" ]
+
+usage = """%prog [options] [pkgname...]
+Show disk usage of installed packages"""
+
+# Number of packages whose files are stat()'ed in one go
+BATCH_SIZE = 64
+# Bump when the layout of cached entries changes
+CACHE_VERSION = 2
+
+def parse_command_line():
+    """Parse command line options."""
+
+    parser = PaludisOptionParser()
+    parser.usage = usage
+
+    ogroup = OptionGroup(parser, "Output Options")
+    ogroup.add_option("-n", "--top", type = "int", dest = "top", default = 20,
+            metavar = "N",
+            help = "Show the N largest packages, 0 shows all. Default: %default")
+    ogroup.add_option("-D", "--directories", type = "int", dest = "directories",
+            default = 0, metavar = "N",
+            help = "Show the N largest directories of every package")
+    ogroup.add_option("-b", "--bytes", action = "store_true", dest = "bytes",
+            default = False, help = "Print sizes in bytes")
+    ogroup.add_option("", "--apparent-size", action = "store_true",
+            dest = "apparent_size", default = False,
+            help = "Show apparent sizes like du --apparent-size instead of disk usage")
+    ogroup.add_option("-s", "--sort", type = "choice",
+            choices = [ "size", "name" ], dest = "sort", default = "size",
+            help = "Order of the shown packages and directories. One of: size, name. Default: %default")
+    parser.add_option_group(ogroup)
+
+    cgroup = OptionGroup(parser, "Cache Options")
+    cgroup.add_option("-j", "--jobs", type = "int", dest = "jobs",
+            help = "Number of files to stat() in parallel")
+    cgroup.add_option("", "--no-cache", action = "store_false", dest = "cache",
+            default = True,
+            help = "Don't use cached results, stat() every file")
+    parser.add_option_group(cgroup)
+
+    parser.epilog = " ".join((parser.epilog, "Without a package, all",
+        "installed packages are measured. Results are cached per package",
+        "and recomputed when its CONTENTS file changes. Hard links are",
+        "counted once per package. Like du, sizes are the space allocated",
+        "on disk unless --apparent-size is given. --top selects the largest",
+        "packages before they are sorted."))
+
+    return parser.parse_args()
+
+def human_readable(size):
+    """Format size in bytes like du -h."""
+    for unit in ("B", "K", "M", "G", "T"):
+        if size < 1024 or unit == "T":
+            break
+        size /= 1024.0
+    if unit == "B":
+        return "%d%s" % (size, unit)
+    return "%.1f%s" % (size, unit)
+
+def measure(paths, apparent_size=False):
+    """stat() paths and return the total size and a dictionary of sizes by
+    directory. Sizes are allocated blocks like du, or apparent sizes if
+    apparent_size is True. Hard links are counted once."""
+    total = 0
+    directories = dict()
+    seen = set()
+    for path in paths:
+        try:
+            st = os.lstat(path)
+        except OSError:
+            continue
+        if st.st_nlink > 1:
+            if (st.st_dev, st.st_ino) in seen:
+                continue
+            seen.add((st.st_dev, st.st_ino))
+        if apparent_size:
+            size = st.st_size
+        else:
+            size = st.st_blocks * 512
+        total += size
+        dname = os.path.dirname(path)
+        directories[dname] = directories.get(dname, 0) + size
+    return total, directories
+
+def package_usage(ids, env, cache, workers=None, apparent_size=False):
+    """Yield (package_id, total, directories) for every package in ids, see
+    measure(). cache maps package ids to (CONTENTS mtime, total,
+    directories) and is updated with new results."""
+    from paludis import ContentsFileEntry
+    from putils.content import contents_mtime
+    from putils.parallel import get_thread_pool
+
+    pool = get_thread_pool(workers)
+    ids = iter(ids)
+    while True:
+        batch = list(islice(ids, BATCH_SIZE))
+        if not batch:
+            break
+
+        todo = []
+        for package_id in batch:
+            key = str(package_id)
+            mtime = contents_mtime(package_id)
+            cached = cache.get(key)
+            if mtime is not None and cached is not None and cached[0] == mtime:
+                continue
+            if package_id.contents_key() is None:
+                cache[key] = (mtime, 0, dict())
+                continue
+            paths = [ rootjoin(content.location_key().parse_value(), env.root)
+                    for content in package_id.contents_key().parse_value()
+                    if isinstance(content, ContentsFileEntry) ]
+            todo.append((key, mtime, paths))
+
+        results = pool.map(lambda paths: measure(paths, apparent_size),
+                [ paths for key, mtime, paths in todo ])
+        for (key, mtime, paths), (total, directories) in zip(todo, results):
+            cache[key] = (mtime, total, directories)
+
+        for package_id in batch:
+            mtime, total, directories = cache[str(package_id)]
+            yield package_id, total, directories
+
+def main():
+    options, args = parse_command_line()
+
+    from putils.content import installed_ids
+
+    with timings.phase("environment"):
+        env = get_environment(options.environment)
+
+    # One file per root and kind of size, so usages of other roots survive
+    cache_path = get_cache_dir("du-%s%s.pickle" % (
+        sha1(env.root).hexdigest()[:16],
+        options.apparent_size and "-apparent" or ""))
+    cache_key = (CACHE_VERSION, env.root)
+    cache = None
+    if options.cache:
+        cache = load_cache(cache_path, cache_key)
+    if cache is None:
+        cache = dict()
+
+    ids = installed_ids(env, args)
+
+    seen = set()
+    def usages():
+        for package_id, total, directories in timings.iterate("stat",
+                package_usage(ids, env, cache, options.jobs,
+                    options.apparent_size)):
+            seen.add(str(package_id))
+            yield total, str(package_id), directories
+
+    # Keep only the largest packages in memory.
+    if options.top > 0:
+        largest = heapq.nlargest(options.top, usages())
+    else:
+        largest = sorted(usages(), reverse=True)
+    if options.sort == "name":
+        largest.sort(key = lambda usage: usage[1])
+
+    if options.cache:
+        if not args:
+            # Forget packages which aren't installed anymore.
+            for key in set(cache) - seen:
+                del cache[key]
+        save_cache(cache_path, cache, cache_key)
+
+    if options.bytes:
+        size_format = str
+    else:
+        size_format = human_readable
+
+    outfd = Output()
+    try:
+        for total, package, directories in largest:
+            print(size_format(total), package, sep="\t", file=outfd)
+            if options.directories > 0:
+                shown = heapq.nlargest(options.directories,
+                        ((size, dname) for dname, size in
+                            directories.iteritems()))
+                if options.sort == "name":
+                    shown.sort(key = lambda usage: usage[1])
+                for size, dname in shown:
+                    print("", size_format(size), dname, sep="\t", file=outfd)
+    except PagerClosed:
+        pass
+    return outfd.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: set sw=4 ts=4 sts=4 et tw=80 fdm=indent :
+#
+# Copyright (c) 2026 Ali Polatel <alip@exherbo.org>
+#
+# This file is part of the paludis-utils. paludis-utils is free software; you
+# can redistribute it and/or modify it under the terms of the GNU General
+# Public License version 2, as published by the Free Software Foundation.
+#
+# paludis-utils is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 59 Temple
+# Place, Suite 330, Boston, MA  02111-1307  USA
+
+"""Export, merge and query contents of many hosts
+"""
+
+from __future__ import print_function
+
+import socket
+import sys
+from optparse import OptionGroup
+
+from putils.getopt import PaludisOptionParser
+from putils.timing import timings
+from putils.util import Output, PagerClosed, get_environment
+
+__all__ = [ "main", "usage" ]
+
+usage = """%prog [options] --export <file>
+       %prog [options] --merge <file> <index>...
+       %prog [options] <index> <path>...
+Export, merge and query contents of many hosts"""
+
+def parse_command_line():
+    """Parse command line options."""
+
+    parser = PaludisOptionParser()
+    parser.usage = usage
+
+    fgroup = OptionGroup(parser, "Index Options")
+    fgroup.add_option("", "--export", dest = "export", metavar = "FILE",
+            help = "Write the contents of installed packages to FILE")
+    fgroup.add_option("", "--host", dest = "host",
+            default = socket.gethostname(),
+            help = "Host name to export contents as. Default: %default")
+    fgroup.add_option("", "--merge", dest = "merge", metavar = "FILE",
+            help = "Merge the given indexes into FILE")
+    parser.add_option_group(fgroup)
+
+    mgroup = OptionGroup(parser, "Matching Options")
+    mgroup.add_option("-m", "--matcher", type = "choice",
+            choices = [ "exact", "simple", "fnmatch", "regex" ],
+            dest = "matcher", default = "exact",
+            help = "How to match paths. One of: exact, simple, fnmatch, regex. Default: %default")
+    mgroup.add_option("-i", "--ignore-case", action = "store_true",
+            dest = "ignore_case", default = False,
+            help = "Ignore case distinctions with fnmatch and regex matchers")
+    parser.add_option_group(mgroup)
+
+    parser.epilog = " ".join((parser.epilog, "Indexes are gzip compressed",
+        "JSON files. Merging keeps identical package contents of different",
+        "hosts once, a host found in more than one index is taken from the",
+        "last. Queries print host, package and path separated by tabs."))
+
+    options, args = parser.parse_args()
+
+    if options.export is not None and options.merge is not None:
+        parser.error("--export and --merge are mutually exclusive")
+    elif options.merge is not None and not args:
+        parser.error("No index specified")
+    elif options.export is None and options.merge is None and len(args) < 2:
+        parser.error("No index or path specified")
+
+    return options, args
+
+def export(options):
+    from putils.fleet import export_contents, save_fleet
+
+    with timings.phase("environment"):
+        env = get_environment(options.environment)
+    with timings.phase("contents"):
+        fleet = export_contents(env, options.host)
+    with timings.phase("save"):
+        save_fleet(options.export, fleet)
+    return 0
+
+def merge(options, args):
+    from putils.fleet import load_fleet, merge_fleets, save_fleet
+
+    try:
+        with timings.phase("load"):
+            fleets = [ load_fleet(path) for path in args ]
+    except (IOError, ValueError), e:
+        print(e, file=sys.stderr)
+        return 1
+    with timings.phase("merge"):
+        fleet = merge_fleets(fleets)
+    with timings.phase("save"):
+        save_fleet(options.merge, fleet)
+    return 0
+
+def query(options, args):
+    from putils.fleet import load_fleet, query_fleet
+
+    try:
+        with timings.phase("load"):
+            fleet = load_fleet(args[0])
+    except (IOError, ValueError), e:
+        print(e, file=sys.stderr)
+        return 1
+
+    outfd = Output()
+    found = set()
+    try:
+        for pattern, host, package, entry_type, path, target in \
+                timings.iterate("query", query_fleet(fleet, args[1:],
+                    options.matcher, options.ignore_case)):
+            found.add(pattern)
+            print(host, package, path, sep="\t", file=outfd)
+    except PagerClosed:
+        pass
+    outfd.close()
+
+    # Like pbelongs, fail if some paths aren't found on any host.
+    if len(found) != len(set(args[1:])):
+        return 1
+    return 0
+
+def main():
+    options, args = parse_command_line()
+
+    if options.export is not None:
+        return export(options)
+    elif options.merge is not None:
+        return merge(options, args)
+    return query(options, args)
+
+if __name__ == '__main__':
+    main()
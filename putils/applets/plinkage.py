@@ -0,0 +1,214 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: set sw=4 ts=4 sts=4 et tw=80 fdm=indent :
+#
+# Copyright (c) 2026 Ali Polatel <alip@exherbo.org>
+#
+# This file is part of the paludis-utils. paludis-utils is free software; you
+# can redistribute it and/or modify it under the terms of the GNU General
+# Public License version 2, as published by the Free Software Foundation.
+#
+# paludis-utils is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 59 Temple
+# Place, Suite 330, Boston, MA  02111-1307  USA
+
+"""Find installed ELF files with unresolved shared libraries
+"""
+
+from __future__ import print_function
+
+import os
+import stat
+from optparse import OptionGroup
+
+from putils.getopt import PaludisOptionParser
+from putils.timing import timings
+from putils.util import (Output, PagerClosed, get_cache_dir, get_environment,
+        load_cache, rootjoin, save_cache)
+
+__all__ = [ "main", "usage" ]
+
+usage = """%prog [options] [pkgname...]
+Find installed ELF files with unresolved shared libraries"""
+
+# Bump when the layout of the ELF cache changes
+CACHE_VERSION = 1
+
+def parse_command_line():
+    """Parse command line options."""
+
+    parser = PaludisOptionParser()
+    parser.usage = usage
+
+    ogroup = OptionGroup(parser, "Output Options")
+    ogroup.add_option("-p", "--packages", action = "store_true",
+            dest = "packages", default = False,
+            help = "Print only the packages with broken files, e.g. to rebuild them")
+    parser.add_option_group(ogroup)
+
+    sgroup = OptionGroup(parser, "Scanning Options")
+    sgroup.add_option("-j", "--jobs", type = "int", dest = "jobs",
+            help = "Number of files to parse in parallel, default: number of processors")
+    sgroup.add_option("", "--no-cache", action = "store_false", dest = "cache",
+            default = True,
+            help = "Don't use cached results, parse every file")
+    parser.add_option_group(sgroup)
+
+    parser.epilog = " ".join((parser.epilog, "Libraries are resolved",
+        "against the libraries installed by all packages and the RPATH and",
+        "RUNPATH of the file. Only the given packages are checked, all",
+        "installed packages if none is given."))
+
+    return parser.parse_args()
+
+def is_candidate(path, st):
+    """Whether path may be an ELF executable or shared library."""
+    return (st is not None and stat.S_ISREG(st.st_mode) and
+            (st.st_mode & 0111 or ".so" in os.path.basename(path)))
+
+def lstat_file(path):
+    """Return (path, os.lstat(path)) or (path, None) if it doesn't exist."""
+    try:
+        return path, os.lstat(path)
+    except OSError:
+        return path, None
+
+def scan_elf_files(env, elf_cache, used_keys, workers=None):
+    """Parse ELF files of all installed packages.
+    Returns a list of (package id, path, ELFInfo) tuples. elf_cache maps
+    (dev, inode, mtime) to ELFInfo or None and is updated with new results,
+    keys of the scanned files are added to used_keys."""
+    from paludis import ContentsFileEntry
+    from putils.content import get_contents
+    from putils.elf import read_elf
+    from putils.parallel import get_process_pool, get_thread_pool
+
+    files = []
+    for package_id, contents in timings.iterate("contents",
+            get_contents("*/*", env, requested_instances=[ContentsFileEntry])):
+        package = str(package_id)
+        for content in contents:
+            files.append((package, rootjoin(content.location_key().parse_value(),
+                env.root)))
+
+    with timings.phase("stat"):
+        stats = dict(get_thread_pool().imap_unordered(lstat_file,
+            [ path for package, path in files ], 64))
+
+    files = [ (package, path, stats[path]) for package, path in files
+            if is_candidate(path, stats[path]) ]
+    keys = dict((path, (st.st_dev, st.st_ino, st.st_mtime))
+            for package, path, st in files)
+    used_keys.update(keys.itervalues())
+
+    to_parse = [ path for path, key in keys.iteritems()
+            if key not in elf_cache ]
+    if to_parse:
+        with timings.phase("parse"):
+            pool = get_process_pool(workers)
+            for path, info in zip(to_parse, pool.imap(read_elf, to_parse, 64)):
+                elf_cache[keys[path]] = info
+
+    return [ (package, path, elf_cache[keys[path]])
+            for package, path, st in files
+            if elf_cache[keys[path]] is not None ]
+
+def build_index(elf_files):
+    """Map library names to the set of (ELF class, machine) tuples of the
+    installed libraries with that name."""
+    index = dict()
+    for package, path, info in elf_files:
+        for name in set((info.soname, os.path.basename(path))):
+            if name is not None:
+                index.setdefault(name, set()).add((info.elf_class,
+                    info.machine))
+    return index
+
+def find_broken(elf_files, index, root, packages=None):
+    """Yield (package id, path, missing libraries) for ELF files with
+    unresolved libraries. If packages is not None, only files of packages in
+    it are checked."""
+    for package, path, info in elf_files:
+        if packages is not None and package not in packages:
+            continue
+
+        missing = []
+        for needed in info.needed:
+            if (info.elf_class, info.machine) in index.get(needed, ()):
+                continue
+            if os.path.isabs(needed):
+                if os.path.exists(rootjoin(needed, root)):
+                    continue
+            else:
+                # $ORIGIN is the directory of the file, already below root
+                origin = os.path.dirname(path)
+                search_path = []
+                for directory in info.rpath + info.runpath:
+                    if not directory:
+                        continue
+                    elif "ORIGIN" in directory:
+                        search_path.append(directory.replace("${ORIGIN}",
+                            origin).replace("$ORIGIN", origin))
+                    else:
+                        search_path.append(rootjoin(directory, root))
+                if any(os.path.exists(os.path.join(directory, needed))
+                        for directory in search_path):
+                    continue
+            missing.append(needed)
+
+        if missing:
+            yield package, path, missing
+
+def main():
+    options, args = parse_command_line()
+
+    from putils.content import installed_ids
+
+    with timings.phase("environment"):
+        env = get_environment(options.environment)
+
+    cache_path = os.path.join(get_cache_dir(), "elf.pickle")
+    elf_cache = None
+    if options.cache:
+        elf_cache = load_cache(cache_path, CACHE_VERSION)
+    if elf_cache is None:
+        elf_cache = dict()
+
+    used_keys = set()
+    elf_files = scan_elf_files(env, elf_cache, used_keys, options.jobs)
+    if options.cache:
+        elf_cache = dict((key, elf_cache[key]) for key in used_keys)
+        save_cache(cache_path, elf_cache, CACHE_VERSION)
+
+    index = build_index(elf_files)
+
+    packages = None
+    if args:
+        packages = set(str(package_id) for package_id in
+                installed_ids(env, args))
+
+    status = 0
+    seen = set()
+    outfd = Output()
+    try:
+        for package, path, missing in find_broken(elf_files, index, env.root,
+                packages):
+            status = 1
+            if options.packages:
+                if package not in seen:
+                    seen.add(package)
+                    print(package, file=outfd)
+            else:
+                print(package, path, ",".join(missing), sep="\t", file=outfd)
+    except PagerClosed:
+        pass
+    outfd.close()
+    return status
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: set sw=4 ts=4 sts=4 et tw=80 fdm=indent :
+#
+# Copyright (c) 2026 Ali Polatel <alip@exherbo.org>
+#
+# This file is part of the paludis-utils. paludis-utils is free software; you
+# can redistribute it and/or modify it under the terms of the GNU General
+# Public License version 2, as published by the Free Software Foundation.
+#
+# paludis-utils is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 59 Temple
+# Place, Suite 330, Boston, MA  02111-1307  USA
+
+"""Find files not owned by any installed package
+"""
+
+from __future__ import print_function
+
+import fnmatch
+import os
+import re
+from optparse import OptionGroup
+
+from putils.getopt import PaludisOptionParser
+from putils.timing import timings
+from putils.util import Output, get_environment, rootjoin
+
+__all__ = [ "main", "usage" ]
+
+usage = """%prog [options] <directory>...
+Find files not owned by any installed package"""
+
+def parse_command_line():
+    """Parse command line options."""
+
+    parser = PaludisOptionParser()
+    parser.usage = usage
+
+    wgroup = OptionGroup(parser, "Walking Options")
+    wgroup.add_option("-x", "--exclude", action = "append", dest = "exclude",
+            default = [], metavar = "PATTERN",
+            help = "Skip paths matching PATTERN using Unix shell-style wildcards, may be given more than once")
+    wgroup.add_option("-j", "--jobs", type = "int", dest = "jobs",
+            help = "Number of directories to read in parallel")
+    wgroup.add_option("-0", "--null", action = "store_true", dest = "null",
+            default = False,
+            help = "Terminate paths with a NUL character instead of a newline")
+    parser.add_option_group(wgroup)
+
+    parser.epilog = " ".join((parser.epilog, "Directories are relative to",
+        "the root of the environment. Unowned directories are reported",
+        "without their contents. Symbolic links to directories are",
+        "resolved, paths are reported under the directory they link to."))
+
+    options, args = parser.parse_args()
+
+    if not args:
+        parser.error("No directory specified")
+
+    return options, args
+
+def canonical_path(path, directories):
+    """Return path with symbolic links in its directory resolved, e.g.
+    /lib/foo is /lib64/foo if /lib links to lib64. The last component
+    isn't resolved, a symbolic link is owned itself. directories caches
+    resolved directories."""
+    dname, basename = os.path.split(path)
+    if dname not in directories:
+        directories[dname] = os.path.realpath(dname)
+    return os.path.join(directories[dname], basename)
+
+def get_owned(env):
+    """Return the set of canonical paths, see canonical_path(), owned by
+    installed packages.
+    Parent directories of owned paths are considered owned as well."""
+    from putils.content import get_contents
+
+    owned = set()
+    directories = dict()
+    for package_id, contents in get_contents("*/*", env):
+        for content in contents:
+            path = canonical_path(os.path.normpath(rootjoin(
+                content.location_key().parse_value(), env.root)), directories)
+            while path not in owned:
+                owned.add(path)
+                path = os.path.dirname(path)
+    return owned
+
+def find_orphans(directories, owned, exclude=None, workers=None):
+    """Walk directories and yield paths not in owned.
+    Unowned directories are yielded but not walked. directories must be
+    canonical like the paths in owned, e.g. resolved by os.path.realpath(),
+    so walked paths are canonical too.
+    exclude is a compiled regex, matching paths are skipped."""
+    from putils.parallel import walk
+
+    def wanted(path):
+        return exclude is None or exclude.match(path) is None
+
+    def descend(path):
+        return path in owned and wanted(path)
+
+    for directory, entries in walk(directories, descend, workers):
+        for path, is_dir in entries:
+            if path not in owned and wanted(path):
+                yield path
+
+def main():
+    options, args = parse_command_line()
+
+    with timings.phase("environment"):
+        env = get_environment(options.environment)
+
+    exclude = None
+    if options.exclude:
+        exclude = re.compile("|".join(fnmatch.translate(pattern)
+            for pattern in options.exclude))
+
+    with timings.phase("contents"):
+        owned = get_owned(env)
+
+    # Walk under the names CONTENTS resolve to, e.g. /lib64 for /lib, and
+    # only once if both are given
+    directories = sorted(set(os.path.realpath(rootjoin(directory, env.root))
+            for directory in args))
+
+    outfd = Output()
+    if options.null:
+        end = "\0"
+    else:
+        end = "\n"
+    outfd.stream(find_orphans(directories, owned, exclude, options.jobs), end)
+    return outfd.close()
+
+if __name__ == '__main__':
+    main()
@@ -25,11 +25,11 @@ from __future__ import print_function
 import re
 from sys import stderr
 from optparse import OptionGroup
-from paludis import EnvironmentFactory, Log, LogContext, LogLevel
 
+from putils.common import memoize
 from putils.getopt import PaludisOptionParser
-from putils.remote import get_ids, get_handler
-from putils.util import setup_pager
+from putils.timing import timings
+from putils.util import Output, PagerClosed, get_environment
 
 __all__ = [ "main", "usage" ]
 
@@ -64,6 +64,8 @@ def parse_auth_data(auth_data):
     if not auth_data:
         return None
 
+    from paludis import Log, LogContext, LogLevel
+
     try:
         pairs = [ map(str.strip, keyval.split("=", 1))
                   for keyval in re.split(r'(?<!\\);', auth_data)
@@ -84,6 +86,8 @@ def parse_command_line():
 
     parser = PaludisOptionParser()
     parser.usage = usage.replace("<pkgname>", "<pkgname>...")
+    parser.epilog = " ".join((parser.epilog, "If more than one --environment",
+        "is given, a combined report comparing the environments is printed."))
 
     parser.add_default_format_options()
 
@@ -107,54 +111,113 @@ def parse_command_line():
 
     return options, args
 
+@memoize(maxsize=1024)
+def get_upstream_version(remote, id, auth_data=None):
+    """Fetch the upstream version of remote id, results are cached so every
+    remote id is fetched once per process."""
+    from putils.remote import get_handler
+
+    handler = get_handler(remote)
+    return handler(id, auth_data=parse_auth_data(auth_data))
+
+def compare_versions(version, version_new):
+    """Compare installed or best version with the upstream version.
+    Returns a tuple of status character, colour and operator."""
+    if version_new > version:
+        return "N", PINK, "<"
+    elif version_new == version:
+        return "E", GREEN, "="
+    else:
+        return "O", RED, ">"
+
+def report(options, args, outfd):
+    """Compare versions of packages in args with upstream versions and write
+    the report to outfd."""
+    from paludis import Log, LogContext, LogLevel
+    from putils.remote import get_ids, get_handler
+
+    # Results keyed by package name and remote id, in the order they are seen.
+    results = dict()
+    result_keys = list()
+    for spec in options.environments:
+        with timings.phase("environment"):
+            env = get_environment(spec)
+        for package in args:
+            for name, version, mkey in timings.iterate("selection",
+                    get_ids(env, package, options.include_masked)):
+                for value in mkey:
+                    try:
+                        remote, id = str(value).split(":", 1)
+                    except ValueError:
+                        Log.instance.message("remote.invalid", LogLevel.WARNING,
+                                LogContext.NO_CONTEXT,
+                                "Invalid REMOTE_IDS key `%s' in package %s-%s" %
+                                (str(value), name, version))
+                        continue
+                    handler = get_handler(remote)
+                    if handler is None:
+                        Log.instance.message("remote.no_handler", LogLevel.WARNING,
+                                LogContext.NO_CONTEXT,
+                                "No handler for remote '%s'" % remote)
+                        continue
+
+                    # Fetched once per remote id, no matter how many
+                    # environments or packages refer to it.
+                    with timings.phase("remote"):
+                        version_new = get_upstream_version(remote, id,
+                                options.auth_data)
+                    if version_new is None:
+                        continue
+
+                    if len(options.environments) == 1:
+                        # Nothing to combine, print results as they come.
+                        with timings.phase("output"):
+                            status, colour, op = compare_versions(version,
+                                    version_new)
+                            print(colour + status + NORM, end=' ', file=outfd)
+                            print("%s-{%s%s %s %s%s} %s%s%s" % (name, colour,
+                                version, op, version_new, NORM, BROWN, value,
+                                NORM), file=outfd)
+                        continue
+
+                    key = (str(name), str(value))
+                    if key not in results:
+                        results[key] = list()
+                        result_keys.append(key)
+                    results[key].append((spec, version, version_new))
+
+    # Combined report, one block per package and remote id.
+    with timings.phase("output"):
+        for key in result_keys:
+            name, value = key
+            version_new = results[key][0][2]
+            print("%s %s%s%s %s" % (name, BROWN, value, NORM, version_new),
+                    file=outfd)
+            for spec, version, version_new in results[key]:
+                status, colour, op = compare_versions(version, version_new)
+                print("    " + colour + status + NORM, end=' ', file=outfd)
+                print("%s: %s%s %s %s%s" % (spec or "default", colour, version,
+                    op, version_new, NORM), file=outfd)
+
 def main():
     options, args = parse_command_line()
-    env = EnvironmentFactory.instance.create(options.environment)
-    proc, outfd = setup_pager()
-    auth_data = parse_auth_data(options.auth_data)
 
-    if proc is not None and options.colour:
+    outfd = Output()
+    # Check auth data early, handlers get the string to keep it hashable.
+    parse_auth_data(options.auth_data)
+
+    if outfd.proc is not None and options.colour:
         global NORM, PINK, GREEN, RED, BROWN, YELLOW
     else:
         NORM = PINK = GREEN = RED = BROWN = YELLOW = ""
 
-    for package in args:
-        for name, version, mkey in get_ids(env, package, options.include_masked):
-            for value in mkey:
-                try:
-                    remote, id = str(value).split(":", 1)
-                except ValueError:
-                    Log.instance.message("remote.invalid", LogLevel.WARNING,
-                            LogContext.NO_CONTEXT,
-                            "Invalid REMOTE_IDS key `%s' in package %s-%s" %
-                            (str(value), name, version))
-                    continue
-                handler = get_handler(remote)
-                if handler is None:
-                    Log.instance.message("remote.no_handler", LogLevel.WARNING,
-                            LogContext.NO_CONTEXT,
-                            "No handler for remote '%s'" % remote)
-                    continue
-
-                version_new = handler(id, auth_data=auth_data)
-                if version_new is None:
-                    continue
-                elif version_new > version:
-                    print(PINK + "N" + NORM, end=' ', file=outfd)
-                    print("%s-{%s%s < %s%s} %s%s%s" % (name, PINK, version,
-                            version_new, NORM, BROWN, value, NORM), file=outfd)
-                elif version_new == version:
-                    print(GREEN + "E" + NORM, end=' ', file=outfd)
-                    print("%s-{%s%s = %s%s} %s%s%s" % (name, GREEN, version,
-                            version_new, NORM, BROWN, value, NORM), file=outfd)
-                else:
-                    print(RED + "O" + NORM, end=' ')
-                    print("%s-{%s%s > %s%s} %s%s%s" % (name, RED, version,
-                            version_new, NORM, BROWN, value, NORM), file=outfd)
-
-    if proc is not None:
-        outfd.close()
-        return proc.wait()
+    try:
+        report(options, args, outfd)
+    except PagerClosed:
+        # Nobody reads the output anymore, stop fetching.
+        pass
+
+    return outfd.close()
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: set sw=4 ts=4 sts=4 et tw=80 fdm=indent :
+#
+# Copyright (c) 2026 Ali Polatel <alip@exherbo.org>
+#
+# This file is part of the paludis-utils. paludis-utils is free software; you
+# can redistribute it and/or modify it under the terms of the GNU General
+# Public License version 2, as published by the Free Software Foundation.
+#
+# paludis-utils is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 59 Temple
+# Place, Suite 330, Boston, MA  02111-1307  USA
+
+"""Snapshot installed packages and compare snapshots
+"""
+
+from __future__ import print_function
+
+import sys
+from optparse import OptionGroup
+
+from putils.getopt import PaludisOptionParser
+from putils.timing import timings
+from putils.util import Output, PagerClosed, get_environment
+
+__all__ = [ "main", "usage" ]
+
+usage = """%prog [options] --create <file>
+       %prog [options] <old> [<new>]
+Snapshot installed packages and compare snapshots"""
+
+def parse_command_line():
+    """Parse command line options."""
+
+    parser = PaludisOptionParser()
+    parser.usage = usage
+
+    sgroup = OptionGroup(parser, "Snapshot Options")
+    sgroup.add_option("-c", "--create", dest = "create", metavar = "FILE",
+            help = "Write a snapshot of installed packages to FILE")
+    sgroup.add_option("", "--store", dest = "store", metavar = "DIR",
+            help = "Directory package contents of snapshots are stored in. Default: psnapshot-objects next to each snapshot")
+    parser.add_option_group(sgroup)
+
+    ogroup = OptionGroup(parser, "Output Options")
+    ogroup.add_option("-p", "--packages-only", action = "store_true",
+            dest = "packages_only", default = False,
+            help = "Only report added, removed and changed packages")
+    ogroup.add_option("-f", "--paths-only", action = "store_true",
+            dest = "paths_only", default = False,
+            help = "Only report added, removed and changed paths")
+    parser.add_option_group(ogroup)
+
+    parser.epilog = " ".join((parser.epilog, "A snapshot lists installed",
+        "packages and digests of their contents, the contents are kept in",
+        "the store once for all snapshots using it. Keep the store with the",
+        "snapshots. Without <new>, <old> is compared",
+        "with installed packages. Packages and paths are printed prefixed by",
+        "- if removed, + if added and ~ if changed. Exits with status 1 if",
+        "the snapshots differ and 2 on errors."))
+
+    options, args = parser.parse_args()
+
+    if options.create is not None and args:
+        parser.error("--create takes no snapshots to compare")
+    elif options.create is None and len(args) not in (1, 2):
+        parser.error("No snapshot or too many snapshots specified")
+    elif options.packages_only and options.paths_only:
+        parser.error("--packages-only and --paths-only are mutually exclusive")
+
+    return options, args
+
+def create(options):
+    from putils.snapshot import (ContentsStore, create_snapshot,
+            save_snapshot, store_path)
+
+    store = ContentsStore(options.store or store_path(options.create))
+    with timings.phase("environment"):
+        env = get_environment(options.environment)
+    try:
+        with timings.phase("contents"):
+            snapshot = create_snapshot(env, store)
+        with timings.phase("save"):
+            save_snapshot(options.create, snapshot)
+    except IOError, e:
+        print(e, file=sys.stderr)
+        return 2
+    return 0
+
+def diff(options, args):
+    from putils.snapshot import (ContentsStore, create_snapshot,
+            diff_snapshots, load_snapshot, store_path)
+
+    # Contents of installed packages go to the store of <old>
+    stores = [ ContentsStore(options.store or store_path(path))
+            for path in args ]
+    try:
+        with timings.phase("load"):
+            snapshots = [ load_snapshot(path) for path in args ]
+        if len(snapshots) == 1:
+            with timings.phase("environment"):
+                env = get_environment(options.environment)
+            with timings.phase("contents"):
+                snapshots.append(create_snapshot(env, stores[0]))
+        with timings.phase("diff"):
+            removed, added, changed, paths = diff_snapshots(snapshots[0],
+                    snapshots[1], stores[0], stores[-1])
+    except (IOError, ValueError), e:
+        print(e, file=sys.stderr)
+        return 2
+
+    outfd = Output()
+    try:
+        if not options.paths_only:
+            for status, packages in (("-", removed), ("+", added),
+                    ("~", changed)):
+                for package in packages:
+                    print(status, package, file=outfd)
+        if not options.packages_only:
+            for status, path, entry_type, target, package in paths:
+                print(status, path, file=outfd)
+    except PagerClosed:
+        pass
+    outfd.close()
+
+    if removed or added or changed:
+        return 1
+    return 0
+
+def main():
+    options, args = parse_command_line()
+
+    if options.create is not None:
+        return create(options)
+    return diff(options, args)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,238 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: set sw=4 ts=4 sts=4 et tw=80 fdm=indent :
+#
+# Copyright (c) 2026 Ali Polatel <alip@exherbo.org>
+#
+# This file is part of the paludis-utils. paludis-utils is free software; you
+# can redistribute it and/or modify it under the terms of the GNU General
+# Public License version 2, as published by the Free Software Foundation.
+#
+# paludis-utils is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 59 Temple
+# Place, Suite 330, Boston, MA  02111-1307  USA
+
+"""Verify installed files against CONTENTS
+"""
+
+from __future__ import print_function
+
+import hashlib
+import mmap
+import os
+import stat
+from itertools import islice
+from optparse import OptionGroup
+
+from putils.getopt import PaludisOptionParser
+from putils.timing import timings
+from putils.util import (Output, PagerClosed, get_cache_dir, get_environment,
+        load_cache, rootjoin, save_cache)
+
+__all__ = [ "main", "usage" ]
+
+usage = """%prog [options] [pkgname...]
+Verify installed files against CONTENTS"""
+
+# Number of packages verified in one go
+BATCH_SIZE = 64
+# Files larger than this are mmap()'ed
+MMAP_THRESHOLD = 4 * 1024 * 1024
+READ_SIZE = 1024 * 1024
+# Bump when the layout of the hash cache changes
+CACHE_VERSION = 1
+
+def parse_command_line():
+    """Parse command line options."""
+
+    parser = PaludisOptionParser()
+    parser.usage = usage
+
+    parser.add_default_content_limit_options()
+
+    vgroup = OptionGroup(parser, "Verification Options")
+    vgroup.add_option("", "--no-checksum", action = "store_false",
+            dest = "checksum", default = True,
+            help = "Don't compare checksums of files")
+    vgroup.add_option("", "--no-mtime", action = "store_false",
+            dest = "mtime", default = True,
+            help = "Don't compare modification times of files")
+    vgroup.add_option("-j", "--jobs", type = "int", dest = "jobs",
+            help = "Number of files to hash in parallel, default: number of processors")
+    vgroup.add_option("", "--no-cache", action = "store_false", dest = "cache",
+            default = True,
+            help = "Don't use cached checksums, hash every file")
+    parser.add_option_group(vgroup)
+
+    parser.epilog = " ".join((parser.epilog, "Without a package, all",
+        "installed packages are verified. Checksums are cached by device,",
+        "inode, size and modification time so unchanged files are not",
+        "hashed again."))
+
+    return parser.parse_args()
+
+def hash_file(path):
+    """Return (path, md5 hex digest) or (path, None) if path can't be read.
+    Runs in worker processes."""
+    md5 = hashlib.md5()
+    try:
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size >= MMAP_THRESHOLD:
+                mapped = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+                try:
+                    md5.update(mapped)
+                finally:
+                    mapped.close()
+            else:
+                for data in iter(lambda: f.read(READ_SIZE), ""):
+                    md5.update(data)
+    except (IOError, OSError, ValueError):
+        return path, None
+    return path, md5.hexdigest()
+
+def lstat_file(path):
+    """Return (path, os.lstat(path)) or (path, None) if it doesn't exist."""
+    try:
+        return path, os.lstat(path)
+    except OSError:
+        return path, None
+
+def check_contents(ids, env, options, hash_cache, used_keys):
+    """Verify contents of packages in ids.
+    Yields (package_id, path, problems) for entries that don't match.
+    hash_cache maps (dev, inode, size, mtime) to md5 digests and is updated
+    with new checksums, keys of the checked files are added to used_keys."""
+    from paludis import ContentsDirEntry, ContentsFileEntry, ContentsSymEntry
+    from putils.content import content_metadata
+    from putils.parallel import get_process_pool, get_thread_pool
+
+    thread_pool = get_thread_pool()
+    ids = iter(ids)
+    while True:
+        batch = list(islice(ids, BATCH_SIZE))
+        if not batch:
+            break
+
+        entries = []
+        for package_id in batch:
+            if package_id.contents_key() is None:
+                continue
+            for content in package_id.contents_key().parse_value():
+                if not any(isinstance(content, i) for i in
+                        options.requested_instances):
+                    continue
+                path = rootjoin(content.location_key().parse_value(), env.root)
+                entries.append((package_id, content, path))
+
+        stats = dict(thread_pool.map(lstat_file,
+            [ path for package_id, content, path in entries ], 64))
+
+        # Hash files whose checksum isn't cached
+        to_hash = set()
+        if options.checksum:
+            for package_id, content, path in entries:
+                st = stats[path]
+                if (isinstance(content, ContentsFileEntry) and st is not None
+                        and stat.S_ISREG(st.st_mode) and
+                        cache_key(st) not in hash_cache):
+                    to_hash.add(path)
+        if to_hash:
+            with timings.phase("checksum"):
+                pool = get_process_pool(options.jobs)
+                for path, digest in pool.imap_unordered(hash_file, to_hash, 16):
+                    st = stats[path]
+                    if digest is not None:
+                        hash_cache[cache_key(st)] = digest
+
+        for package_id, content, path in entries:
+            st = stats[path]
+            problems = []
+            if st is None:
+                problems.append("missing")
+            elif isinstance(content, ContentsFileEntry):
+                if not stat.S_ISREG(st.st_mode):
+                    problems.append("type")
+                else:
+                    mtime = content_metadata(content, "mtime")
+                    if (options.mtime and mtime is not None and
+                            int(st.st_mtime) != int(mtime)):
+                        problems.append("mtime")
+                    md5 = content_metadata(content, "md5")
+                    used_keys.add(cache_key(st))
+                    digest = hash_cache.get(cache_key(st))
+                    if options.checksum and md5:
+                        if digest is None:
+                            # hash_file() couldn't read it
+                            problems.append("unreadable")
+                        elif digest != md5:
+                            problems.append("md5")
+            elif isinstance(content, ContentsDirEntry):
+                if not stat.S_ISDIR(st.st_mode):
+                    problems.append("type")
+            elif isinstance(content, ContentsSymEntry):
+                if not stat.S_ISLNK(st.st_mode):
+                    problems.append("type")
+                else:
+                    try:
+                        if (os.readlink(path) !=
+                                content.target_key().parse_value()):
+                            problems.append("target")
+                    except OSError:
+                        problems.append("missing")
+            if problems:
+                yield package_id, path, problems
+
+def cache_key(st):
+    """Key of a file in the hash cache."""
+    return (st.st_dev, st.st_ino, st.st_size, st.st_mtime)
+
+def main():
+    options, args = parse_command_line()
+
+    from putils.content import installed_ids
+
+    with timings.phase("environment"):
+        env = get_environment(options.environment)
+
+    cache_path = os.path.join(get_cache_dir(), "md5.pickle")
+    hash_cache = None
+    if options.cache:
+        hash_cache = load_cache(cache_path, CACHE_VERSION)
+    if hash_cache is None:
+        hash_cache = dict()
+
+    used_keys = set()
+    status = 0
+    finished = False
+    outfd = Output()
+    try:
+        for package_id, path, problems in timings.iterate("verify",
+                check_contents(installed_ids(env, args), env, options,
+                    hash_cache, used_keys)):
+            status = 1
+            print(package_id, path, ",".join(problems), sep="\t", file=outfd)
+        finished = True
+    except PagerClosed:
+        pass
+    outfd.close()
+
+    if options.cache:
+        from paludis import ContentsFileEntry
+        checked_files = options.checksum and any(issubclass(ContentsFileEntry,
+            i) for i in options.requested_instances)
+        if not args and finished and checked_files:
+            # Every installed file was checked, forget the others which
+            # aren't installed anymore.
+            hash_cache = dict((key, hash_cache[key]) for key in used_keys
+                    if key in hash_cache)
+        save_cache(cache_path, hash_cache, CACHE_VERSION)
+    return status
+
+if __name__ == '__main__':
+    main()
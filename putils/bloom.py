@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: set sw=4 ts=4 sts=4 et tw=80 fdm=indent :
+#
+# Copyright (c) 2026 Ali Polatel <alip@exherbo.org>
+#
+# This file is part of the paludis-utils. paludis-utils is free software; you
+# can redistribute it and/or modify it under the terms of the GNU General
+# Public License version 2, as published by the Free Software Foundation.
+#
+# paludis-utils is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 59 Temple
+# Place, Suite 330, Boston, MA  02111-1307  USA
+
+"""Bloom filters of the paths installed by packages
+"""
+
+import math
+import os
+import struct
+from hashlib import md5, sha1
+
+from putils.util import get_cache_dir, load_cache, rootjoin, save_cache
+
+__all__ = [ "BloomFilter", "ContentsFilters", "bloom_hashes" ]
+
+# Bump when the layout of cached filters changes
+BLOOM_VERSION = 1
+
+def bloom_hashes(key):
+    """Return the pair of hashes of key used by BloomFilter.
+    Compute them once when checking a key against many filters."""
+    return struct.unpack("<QQ", md5(key).digest())
+
+class BloomFilter(object):
+    """Set of strings which may report false positives but never false
+    negatives. capacity is the expected number of strings and error_rate
+    the wanted false positive rate at that capacity."""
+
+    def __init__(self, capacity, error_rate=0.01):
+        capacity = max(capacity, 1)
+        self.size = max(64, int(math.ceil(-capacity * math.log(error_rate) /
+            math.log(2) ** 2)))
+        self.hash_count = max(1, int(round(self.size * math.log(2) /
+            capacity)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, hashes):
+        h1, h2 = hashes
+        size = self.size
+        return [ (h1 + i * h2) % size for i in xrange(self.hash_count) ]
+
+    def add(self, key):
+        """Add the string key."""
+        bits = self.bits
+        for position in self._positions(bloom_hashes(key)):
+            bits[position >> 3] |= 1 << (position & 7)
+
+    def contains_hashes(self, hashes):
+        """Like key in self, taking bloom_hashes(key) instead of key."""
+        bits = self.bits
+        for position in self._positions(hashes):
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def __contains__(self, key):
+        return self.contains_hashes(bloom_hashes(key))
+
+class ContentsFilters(object):
+    """Bloom filters of the paths and basenames in CONTENTS of every
+    installed package, persisted in the cache directory and loaded when
+    first needed. A filter is rebuilt when the CONTENTS file of its package
+    changes."""
+
+    def __init__(self, env, cache=True):
+        self.env = env
+        self.cache = cache
+        # One file per root, so filters of other roots survive
+        self.path = get_cache_dir("bloom-%s.pickle" %
+                sha1(env.root).hexdigest()[:16])
+        self.key = (BLOOM_VERSION, env.root)
+        self._filters = None
+        self.seen = set()
+        self.changed = False
+
+    @property
+    def filters(self):
+        """Dictionary mapping package id strings to (CONTENTS mtime, Bloom
+        filter) tuples."""
+        if self._filters is None:
+            if self.cache:
+                self._filters = load_cache(self.path, self.key)
+            if self._filters is None:
+                self._filters = dict()
+        return self._filters
+
+    def build(self, package_id):
+        """Return a Bloom filter of the paths installed by package_id."""
+        paths = [ rootjoin(content.location_key().parse_value(), self.env.root)
+                for content in package_id.contents_key().parse_value() ]
+        bloom = BloomFilter(2 * len(paths))
+        for path in paths:
+            bloom.add(path)
+            basename = os.path.basename(path)
+            if basename != path:
+                bloom.add(basename)
+        return bloom
+
+    def may_contain(self, package_id, hashes):
+        """Return False if no path or basename in CONTENTS of package_id
+        has one of hashes, see bloom_hashes(), and True if one may have.
+        package_id must have a contents key."""
+        from putils.content import contents_mtime
+
+        package = str(package_id)
+        self.seen.add(package)
+        mtime = contents_mtime(package_id)
+        entry = self.filters.get(package)
+        if entry is None or mtime is None or entry[0] != mtime:
+            entry = self.filters[package] = (mtime, self.build(package_id))
+            self.changed = True
+
+        bloom = entry[1]
+        for key_hashes in hashes:
+            if bloom.contains_hashes(key_hashes):
+                return True
+        return False
+
+    def save(self, prune=False):
+        """Save the filters if any of them changed.
+        If prune is True, drop filters of packages which weren't checked
+        since they were loaded, e.g. after checking all installed packages."""
+        if self._filters is None:
+            return
+        if prune:
+            for package in set(self.filters) - self.seen:
+                del self.filters[package]
+                self.changed = True
+        if self.cache and self.changed:
+            save_cache(self.path, self.filters, self.key)
+            self.changed = False
@@ -25,30 +25,56 @@ checking whether it's setuid, setgid, executable etc.
 
 import os
 import fnmatch
+import hashlib
 import re
 
+from itertools import islice
+
 from stat import S_IMODE
 
-from paludis import (ContentsDirEntry, ContentsFileEntry,
-        ContentsSymEntry, ContentsOtherEntry)
+from paludis import ContentsDirEntry, ContentsFileEntry, ContentsSymEntry
 
-from putils.common import cache_return
-from putils.util import rootjoin
-import putils.user
+from putils.common import memoize
+from putils.parallel import get_thread_pool, group_by_directory
+from putils.util import get_cache_dir, load_cache, rootjoin, save_cache
 
 # The number of named groups the re module supports.
 REGEX_GROUPS_MAX = 100
+# Characters that have a special meaning in wildcards.
+GLOB_SPECIAL = re.compile(r"[*?[]")
+
+# User settings, see _load_user_settings()
+STAT_FILES = True
+STAT_WORKERS = 16
+MATCHER_CACHE = True
+COLOUR_PERM_DENIED = "7m"
 
-STAT_FILES = bool(getattr(putils.user, "colours_stat_files", 1))
-COLOUR_PERM_DENIED = getattr(putils.user, "colours_perm_denied", "7m")
+STAT_BATCH_SIZE = 1024
+# Bump when WildcardMatcher changes to invalidate cached matchers.
+MATCHER_CACHE_VERSION = "1"
 
-__all__ = [ "colourify_content" , "no_colourify_content" ]
+__all__ = [ "colourify_content", "colourify_many", "no_colourify_content" ]
 
 # Special keys in LS_COLORS
 lscolours_keys = ( "tw", "ow", "st", "su", "sg", "or", "ln", "pi", "so", "do",
         "bd", "cd", "di", "ex", "fi", "mi", "no" )
 
-@cache_return
+@memoize(maxsize=1)
+def _load_user_settings():
+    """Load settings from the user configuration.
+    This is done on first use rather than on import because importing
+    putils.user runs the user's configuration file."""
+    global STAT_FILES, STAT_WORKERS, MATCHER_CACHE, COLOUR_PERM_DENIED
+    import putils.user
+
+    STAT_FILES = bool(getattr(putils.user, "colours_stat_files", STAT_FILES))
+    STAT_WORKERS = int(getattr(putils.user, "colours_stat_workers",
+        STAT_WORKERS))
+    MATCHER_CACHE = bool(getattr(putils.user, "colours_cache", MATCHER_CACHE))
+    COLOUR_PERM_DENIED = getattr(putils.user, "colours_perm_denied",
+            COLOUR_PERM_DENIED)
+
+@memoize(maxsize=1)
 def parse_ls_colours():
     """Convert LS_COLORS into two dictionaries,
     One has wildcards and associated colour codes,
@@ -72,91 +98,255 @@ def parse_ls_colours():
 
     return codes, special_codes
 
-@cache_return
+@memoize(maxsize=32)
 def translate(wildcards, flags=0):
-    """Translate a group of wildcards into a compiled regex"""
-    regex = "("
+    """Translate a group of wildcards into a compiled regex.
+    Every wildcard gets its own group so match.lastindex tells which one
+    matched."""
+    regex = "|".join("(" + fnmatch.translate(wildcard) + ")"
+            for wildcard in wildcards)
+    return re.compile(regex, flags)
 
-    index = 0
-    last_index = len(wildcards) - 1
-    for wildcard in wildcards:
-        regex += "(" + fnmatch.translate(wildcard) + ")"
-        if last_index != index:
-            regex += "|"
-        index += 1
+class WildcardMatcher(object):
+    """Match filenames against the wildcards in LS_COLORS.
+    Wildcards without special characters are looked up by name, wildcards of
+    the form *suffix (e.g. *.tar.gz) are looked up by suffix and only the
+    remaining wildcards are matched using regular expressions."""
 
-    regex += ")"
+    def __init__(self, colour_codes):
+        self.names = dict()
+        self.suffixes = dict()
+        globs = list()
 
-    return re.compile(regex, flags)
+        for wildcard, colour_code in colour_codes.iteritems():
+            if GLOB_SPECIAL.search(wildcard) is None:
+                self.names[wildcard] = colour_code
+            elif (wildcard.startswith("*") and len(wildcard) > 1 and
+                    GLOB_SPECIAL.search(wildcard[1:]) is None):
+                self.suffixes[wildcard[1:]] = colour_code
+            else:
+                globs.append((wildcard, colour_code))
 
-def colourify_file(filename, colour_codes, special_codes):
-    """Colourify given filename."""
-    if len(colour_codes) > REGEX_GROUPS_MAX:
-        for wildcard in colour_codes:
-            if fnmatch.fnmatch(filename, wildcard):
-                return "\033[" + colour_codes[wildcard] + "m" + filename + "\033[m"
-    else:
-        wildcard_regex = translate(colour_codes)
-        match = wildcard_regex.match(filename)
+        # Longest suffix wins, e.g. *.tar.gz is preferred over *.gz
+        self.suffix_lengths = sorted(set(len(suffix) for suffix in
+            self.suffixes), reverse=True)
+
+        # The re module doesn't support more than REGEX_GROUPS_MAX groups so
+        # split the remaining wildcards into chunks.
+        self.globs = list()
+        chunk_size = REGEX_GROUPS_MAX - 1
+        for index in range(0, len(globs), chunk_size):
+            chunk = globs[index:index + chunk_size]
+            self.globs.append((tuple(w for w, c in chunk),
+                [c for w, c in chunk]))
+        # Compiled lazily, most filenames are matched by name or suffix.
+        self._regexes = None
 
-        if match is not None:
-            # The first matched group is the parent, skip it.
-            key_index = list(match.groups()[1:]).index(filename)
-            key = colour_codes.keys()[key_index]
+    def __len__(self):
+        return (len(self.names) + len(self.suffixes) +
+                sum(len(codes) for wildcards, codes in self.globs))
 
-            return "\033[" + colour_codes[key] + "m" + filename + "\033[m"
+    def __getstate__(self):
+        # Compiled regexes are recompiled after unpickling.
+        state = self.__dict__.copy()
+        state["_regexes"] = None
+        return state
+
+    @property
+    def regexes(self):
+        """List of (compiled regex, colour codes) tuples."""
+        if self._regexes is None:
+            self._regexes = [ (translate(wildcards), codes)
+                    for wildcards, codes in self.globs ]
+        return self._regexes
+
+    def match(self, filename):
+        """Return the colour code of filename or None if no wildcard
+        matches."""
+        colour_code = self.names.get(filename)
+        if colour_code is not None:
+            return colour_code
+
+        for length in self.suffix_lengths:
+            colour_code = self.suffixes.get(filename[-length:])
+            if colour_code is not None:
+                return colour_code
+
+        for regex, codes in self.regexes:
+            match = regex.match(filename)
+            if match is not None:
+                return codes[match.lastindex - 1]
+
+        return None
+
+def _ls_colours_cache_key():
+    """Key of the matcher cache, changes with LS_COLORS, the user
+    configuration and the layout of WildcardMatcher."""
+    import putils.user
+
+    key = hashlib.sha1(MATCHER_CACHE_VERSION)
+    key.update(os.environ["LS_COLORS"])
+    try:
+        with open(putils.user.putils_rc, "rb") as f:
+            key.update(f.read())
+    except IOError:
+        pass
+    return key.hexdigest()
+
+@memoize(maxsize=1)
+def ls_colours_matcher():
+    """Return a WildcardMatcher for wildcards in LS_COLORS and the dictionary
+    of special codes.
+    The result is cached in the user's cache directory and rebuilt only if
+    LS_COLORS or the user configuration changes."""
+    _load_user_settings()
+
+    if not "LS_COLORS" in os.environ:
+        return None, None
+
+    if MATCHER_CACHE:
+        cache_path = os.path.join(get_cache_dir(), "ls_colours.pickle")
+        cache_key = _ls_colours_cache_key()
+        cached = load_cache(cache_path, cache_key)
+        if cached is not None:
+            return cached
+
+    codes, special_codes = parse_ls_colours()
+    matcher = WildcardMatcher(codes)
+
+    if MATCHER_CACHE:
+        save_cache(cache_path, (matcher, special_codes), cache_key)
+    return matcher, special_codes
+
+def colourify_file(filename, matcher, special_codes, stat_cache=None):
+    """Colourify given filename.
+    If stat_cache is given, it's a dictionary mapping filenames to the result
+    of stat_files() and it's used instead of calling os.stat()."""
+    colour_code = matcher.match(filename)
+    if colour_code is not None:
+        return "\033[" + colour_code + "m" + filename + "\033[m"
 
     if not STAT_FILES:
-        return root + filename
+        return filename
 
     # Only stat() files here.
-    try:
-        mode = os.stat(filename)[0]
-    except OSError, e:
-        if e.errno == 2: # File doesn't exist
+    if stat_cache is not None and filename in stat_cache:
+        result = stat_cache[filename]
+    else:
+        result = stat_file(filename)
+
+    if isinstance(result, OSError):
+        if result.errno == 2: # File doesn't exist
             return "\033[" + special_codes.get("mi", "00") + "m" + filename + "\033[m"
-        elif e.errno == 13: # Not allowed to stat()
-            global COLOUR_PERM_DENIED
-            return "\033[" + COLOUR_PERM_DENIED + root + filename + "\033[m"
+        elif result.errno == 13: # Not allowed to stat()
+            return "\033[" + COLOUR_PERM_DENIED + filename + "\033[m"
+        else:
+            return filename
     else:
-        if S_IMODE(mode) & 04000: # File is setuid (u+s)
+        mode = S_IMODE(result[0])
+        if mode & 04000: # File is setuid (u+s)
             return "\033[" + special_codes.get("su", "00") + "m" + filename + "\033[m"
-        elif S_IMODE(mode) & 02000: # File is setgid (g+s)
+        elif mode & 02000: # File is setgid (g+s)
             return "\033[" + special_codes.get("sg", "00") + "m" + filename + "\033[m"
-        elif os.access(filename, os.X_OK): # File is executable
+        elif mode & 0111: # File is executable, like ls(1) check the mode bits
             return "\033[" + special_codes.get("ex", "00") + "m" + filename + "\033[m"
         else:
             return filename
 
-def colourify_content(content, root="", target=False):
-    """Colourify content name using LS_COLORS.
-    If target is True and content is a symbolic link,
-    colourify content.target instead of content.name."""
+def stat_file(filename):
+    """Return the result of os.stat() or the OSError it raised."""
+    try:
+        return os.stat(filename)
+    except OSError, e:
+        return e
 
-    content_name = rootjoin(content.location_key().parse_value(), root)
+def stat_files(directory_group):
+    """stat() files in one directory, see putils.parallel.group_by_directory().
+    Returns a list of (filename, stat_file(filename)) tuples."""
+    dname, filenames = directory_group
+    return [ (filename, stat_file(filename)) for filename in filenames ]
 
-    codes, special_codes = parse_ls_colours()
-    if not codes and not special_codes:
-        return content_name
+def _content_file(content, root, target):
+    """Return the filename to colourify as a file and the directory prefix to
+    strip from the result, or None if content isn't coloured as a file."""
+    if isinstance(content, ContentsFileEntry):
+        return rootjoin(content.location_key().parse_value(), root), None
+    elif target and isinstance(content, ContentsSymEntry):
+        content_target = content.target_key().parse_value()
+        if os.path.isabs(content_target):
+            return rootjoin(content_target, root), None
+        else:
+            content_name = rootjoin(content.location_key().parse_value(), root)
+            dname = os.path.dirname(content_name)
+            return rootjoin(content_target, dname), dname + os.path.sep
+    return None
 
+def _colourify_content(content, root, target, matcher, special_codes,
+        stat_cache=None):
+    content_file = _content_file(content, root, target)
+    if content_file is not None:
+        filename, prefix = content_file
+        coloured = colourify_file(filename, matcher, special_codes, stat_cache)
+        if prefix is not None:
+            coloured = coloured.replace(prefix, '')
+        return coloured
+
+    content_name = rootjoin(content.location_key().parse_value(), root)
     if isinstance(content, ContentsDirEntry):
         return "\033[" + special_codes.get("di", "00") + "m" + content_name + "\033[m"
-    if isinstance(content, ContentsFileEntry):
-        return colourify_file(content_name, codes, special_codes)
     elif isinstance(content, ContentsSymEntry):
-        if not target:
-            return "\033[" + special_codes.get("ln", "00") + "m" + content_name + "\033[m"
-        elif os.path.isabs(content.target_key().parse_value()):
-            content_target = rootjoin(content.target_key().parse_value(), root)
-            return colourify_file(content_target, codes, special_codes)
-        else:
-            dname = os.path.dirname(content_name)
-            abstarget = rootjoin(content.target_key().parse_value(), dname)
-            return colourify_file(abstarget, codes, special_codes).replace(
-                        dname + os.path.sep, '')
+        return "\033[" + special_codes.get("ln", "00") + "m" + content_name + "\033[m"
     else:
         return content_name
 
+def colourify_content(content, root="", target=False):
+    """Colourify content name using LS_COLORS.
+    If target is True and content is a symbolic link,
+    colourify content.target instead of content.name."""
+
+    matcher, special_codes = ls_colours_matcher()
+    if not matcher and not special_codes:
+        return rootjoin(content.location_key().parse_value(), root)
+
+    return _colourify_content(content, root, target, matcher, special_codes)
+
+def colourify_many(contents, root="", target=False, batch_size=STAT_BATCH_SIZE):
+    """Colourify an iterable of contents, see colourify_content().
+    Contents are processed in batches of batch_size. Files which have to be
+    stat()'ed are grouped by directory and stat()'ed by a pool of workers
+    before the batch is coloured. Yields coloured names in order."""
+
+    matcher, special_codes = ls_colours_matcher()
+    if not matcher and not special_codes:
+        for content in contents:
+            yield rootjoin(content.location_key().parse_value(), root)
+        return
+
+    contents = iter(contents)
+    while True:
+        batch = list(islice(contents, batch_size))
+        if not batch:
+            break
+
+        stat_cache = None
+        if STAT_FILES:
+            filenames = list()
+            for content in batch:
+                content_file = _content_file(content, root, target)
+                if (content_file is not None and
+                        matcher.match(content_file[0]) is None):
+                    filenames.append(content_file[0])
+
+            stat_cache = dict()
+            pool = get_thread_pool(STAT_WORKERS)
+            for results in pool.imap_unordered(stat_files,
+                    group_by_directory(filenames)):
+                stat_cache.update(results)
+
+        for content in batch:
+            yield _colourify_content(content, root, target, matcher,
+                    special_codes, stat_cache)
+
 def no_colourify_content(content, root="", target=False):
     """Dummy replacement for colourify_content() with no colouring."""
     content_name = rootjoin(content.location_key().parse_value(), root)
@@ -25,28 +25,133 @@ from __future__ import print_function
 import inspect
 import os
 import sys
+import threading
+import time
+from collections import OrderedDict
+from functools import update_wrapper
 
-__all__ = [ "cache_return", "exiting_signal_handler" ]
+__all__ = [ "CachedFunction", "memoize", "cache_return", "cache_statistics",
+        "exiting_signal_handler" ]
 
-class cache_return:
-    """Decorator to cache the return values of a function."""
-    def __init__(self, function):
+# All functions decorated with memoize, used by cache_statistics()
+_cached_functions = []
+
+class CachedFunction(object):
+    """Cache the return values of a function.
+
+    Return values are stored in a dictionary keyed by the arguments. Arguments
+    that can't be hashed (lists, dictionaries...) are compared using == against
+    a separate list of seen arguments instead, which is slow for large caches
+    so such functions should be given a small maxsize.
+
+    If maxsize is not None, the least recently used entries are evicted when
+    the cache grows beyond maxsize entries. If ttl is not None, entries older
+    than ttl seconds are considered expired and recomputed."""
+
+    def __init__(self, function, maxsize=128, ttl=None):
         self.function = function
-        # Use two lists instead of a dictionary
-        # so unhashable objects can be cached as well.
-        self.cache_args = []
-        self.cache_rets = []
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        # key -> (timestamp, return value)
+        self.cache = OrderedDict()
+        # [ key, timestamp, return value ] for unhashable keys
+        self.cache_unhashable = []
+
+        update_wrapper(self, function)
+        _cached_functions.append(self)
 
     def __call__(self, *args, **kwargs):
-        if (args,kwargs) in self.cache_args:
-            return self.cache_rets[self.cache_args.index((args,kwargs))]
+        key = (args, tuple(sorted(kwargs.items())))
+        try:
+            hash(key)
+        except TypeError:
+            hashable = False
+        else:
+            hashable = True
+
+        with self.lock:
+            found, ret = self.__lookup(key, hashable)
+            if found:
+                self.hits += 1
+                return ret
+            self.misses += 1
+
+        ret = self.function(*args, **kwargs)
+
+        with self.lock:
+            self.__store(key, hashable, ret)
+        return ret
+
+    def __expired(self, timestamp):
+        return self.ttl is not None and time.time() - timestamp > self.ttl
+
+    def __lookup(self, key, hashable):
+        if hashable:
+            if key not in self.cache:
+                return False, None
+            timestamp, ret = self.cache.pop(key)
+            if self.__expired(timestamp):
+                return False, None
+            # Reinsert to mark as most recently used
+            self.cache[key] = (timestamp, ret)
+            return True, ret
+        else:
+            for index, (cached_key, timestamp, ret) in enumerate(
+                    self.cache_unhashable):
+                if cached_key == key:
+                    del self.cache_unhashable[index]
+                    if self.__expired(timestamp):
+                        return False, None
+                    self.cache_unhashable.append((cached_key, timestamp, ret))
+                    return True, ret
+            return False, None
+
+    def __store(self, key, hashable, ret):
+        timestamp = time.time()
+        if hashable:
+            self.cache.pop(key, None)
+            self.cache[key] = (timestamp, ret)
+            while self.maxsize is not None and len(self.cache) > self.maxsize:
+                self.cache.popitem(last=False)
         else:
-            ret = self.function(*args, **kwargs)
+            self.cache_unhashable = [entry for entry in self.cache_unhashable
+                    if entry[0] != key]
+            self.cache_unhashable.append((key, timestamp, ret))
+            if (self.maxsize is not None and
+                    len(self.cache_unhashable) > self.maxsize):
+                del self.cache_unhashable[:-self.maxsize]
+
+    def cache_info(self):
+        """Return a dictionary of cache statistics."""
+        return { "hits" : self.hits, "misses" : self.misses,
+                "size" : len(self.cache) + len(self.cache_unhashable),
+                "maxsize" : self.maxsize, "ttl" : self.ttl }
+
+    def cache_clear(self):
+        """Clear the cache and its statistics."""
+        with self.lock:
+            self.cache.clear()
+            del self.cache_unhashable[:]
+            self.hits = self.misses = 0
+
+def memoize(maxsize=128, ttl=None):
+    """Decorator to cache the return values of a function.
+    See CachedFunction for the meaning of the arguments."""
+    def decorator(function):
+        return CachedFunction(function, maxsize, ttl)
+    return decorator
 
-            self.cache_args.append((args,kwargs))
-            self.cache_rets.append(ret)
+# Old name of the decorator, which cached every call without bound
+cache_return = memoize(maxsize=None)
 
-            return ret
+def cache_statistics():
+    """Return a list of (function name, statistics) pairs for all memoized
+    functions."""
+    return [ (cached.__module__ + "." + cached.__name__, cached.cache_info())
+            for cached in _cached_functions ]
 
 def _get_module_name(path):
     """Get module name"""
@@ -0,0 +1,278 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: set sw=4 ts=4 sts=4 et tw=80 fdm=indent :
+#
+# Copyright (c) 2026 Ali Polatel <alip@exherbo.org>
+#
+# This file is part of the paludis-utils. paludis-utils is free software; you
+# can redistribute it and/or modify it under the terms of the GNU General
+# Public License version 2, as published by the Free Software Foundation.
+#
+# paludis-utils is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 59 Temple
+# Place, Suite 330, Boston, MA  02111-1307  USA
+
+"""Shell completion from a cached index
+"""
+
+from __future__ import print_function
+
+import os
+import re
+import sys
+import time
+from bisect import bisect_left
+from hashlib import sha1
+
+from putils.util import get_cache_dir, load_cache, save_cache
+
+__all__ = [ "build_index", "complete", "index_path", "refresh_index" ]
+
+# Bump when the layout of the index changes
+COMPLETION_VERSION = 1
+# A refresh which didn't finish after this many seconds is considered dead
+REFRESH_TIMEOUT = 300
+
+def index_path(spec=""):
+    """Return the path of the completion index of the environment spec."""
+    if spec:
+        return get_cache_dir("completion-%s.pickle" %
+                sha1(spec).hexdigest()[:16])
+    return get_cache_dir("completion.pickle")
+
+def generation(locations):
+    """Return a value which changes when repositories at locations or the
+    applets of paludis-utils change, without importing paludis.
+    It is made up of the modification times of the repositories and their
+    top level directories."""
+    from putils import applets
+
+    stamps = []
+    for location in [ os.path.dirname(os.path.abspath(applets.__file__)) ] + \
+            sorted(locations):
+        try:
+            names = os.listdir(location)
+            stamps.append((location, os.stat(location).st_mtime))
+        except OSError:
+            stamps.append((location, None))
+            continue
+        for name in names:
+            path = os.path.join(location, name)
+            try:
+                stamps.append((name, os.stat(path).st_mtime))
+            except OSError:
+                continue
+    return sha1(repr(sorted(stamps))).hexdigest()
+
+#{{{Building the index
+class _ParserCaptured(Exception):
+    def __init__(self, parser):
+        Exception.__init__(self)
+        self.parser = parser
+
+def _applet_parser(applet):
+    """Return the PaludisOptionParser of applet, without parsing the
+    command line."""
+    from putils.applets import get_applet
+    from putils.getopt import PaludisOptionParser
+
+    module = get_applet(applet)
+    if module is None or not hasattr(module, "parse_command_line"):
+        return None
+
+    def capture(self, *args, **kwargs):
+        raise _ParserCaptured(self)
+
+    parse_args = PaludisOptionParser.parse_args
+    PaludisOptionParser.parse_args = capture
+    try:
+        module.parse_command_line()
+    except _ParserCaptured, e:
+        return e.parser
+    finally:
+        PaludisOptionParser.parse_args = parse_args
+    return None
+
+def _regex_choices(option):
+    """Return the names accepted by a regex_choice option, both in full and
+    abbreviated, e.g. all-versions-sorted and avs for AllVersionsSorted."""
+    choices = []
+    for regexp in option.choices:
+        choice_re = re.compile(regexp, option.regex_flag)
+        for name in choice_re.groupindex:
+            words = re.findall("[A-Z][a-z]*", name)
+            for choice in ("-".join(words).lower(),
+                    "".join(word[0] for word in words).lower()):
+                if choice_re.match(choice):
+                    choices.append(choice)
+    return choices
+
+def applet_options(applet):
+    """Return a list of (names, takes value, choices) tuples of the options
+    of applet, hidden options are left out."""
+    from optparse import SUPPRESS_HELP
+
+    parser = _applet_parser(applet)
+    if parser is None:
+        return []
+
+    options = []
+    for option in parser._get_all_options():
+        if option.help == SUPPRESS_HELP:
+            continue
+        if option.type == "regex_choice":
+            choices = _regex_choices(option)
+        else:
+            choices = list(option.choices or [])
+        options.append((option._short_opts + option._long_opts,
+            option.takes_value(), choices))
+    return options
+
+def build_index(spec=""):
+    """Build the completion index of the environment spec.
+    This imports paludis and reads every repository, see refresh_index()."""
+    from paludis import Generator, Selection
+    from putils.applets import __all__ as applets
+    from putils.util import get_environment
+
+    env = get_environment(spec)
+
+    locations = []
+    for repository in env.repositories:
+        location_key = repository.location_key()
+        if location_key is not None:
+            locations.append(str(location_key.parse_value()))
+
+    names = set(str(package_id.name) for package_id in
+            env[Selection.AllVersionsUnsorted(Generator.All())])
+
+    return { "generation" : generation(locations), "locations" : locations,
+            "packages" : sorted(names),
+            "categories" : sorted(set(name.split("/")[0] + "/"
+                for name in names)),
+            "applets" : dict((applet, applet_options(applet))
+                for applet in applets) }
+
+def refresh_index(spec=""):
+    """Build and save the completion index of the environment spec."""
+    path = index_path(spec)
+    try:
+        save_cache(path, build_index(spec), COMPLETION_VERSION)
+    finally:
+        try:
+            os.unlink(path + ".lock")
+        except OSError:
+            pass
+
+def _refresh_in_background(spec):
+    """Run refresh_index() in a detached process unless one is running."""
+    from subprocess import Popen
+
+    lock = index_path(spec) + ".lock"
+    try:
+        if time.time() - os.stat(lock).st_mtime < REFRESH_TIMEOUT:
+            return
+        os.unlink(lock)
+    except OSError:
+        pass
+    try:
+        if not os.path.isdir(os.path.dirname(lock)):
+            os.makedirs(os.path.dirname(lock))
+        os.close(os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0644))
+    except OSError:
+        return
+
+    env = os.environ.copy()
+    top = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, (top,
+        env.get("PYTHONPATH"))))
+    with open(os.devnull, "r+") as devnull:
+        Popen([ sys.executable, "-m", "putils.complete", spec ],
+                stdin = devnull, stdout = devnull, stderr = devnull,
+                close_fds = True, preexec_fn = os.setsid, env = env)
+#}}}
+
+#{{{Completing
+def _prefixed(names, prefix):
+    """Return the names in the sorted list names starting with prefix."""
+    result = []
+    for name in names[bisect_left(names, prefix):]:
+        if not name.startswith(prefix):
+            break
+        result.append(name)
+    return result
+
+def _option_spec(options, word):
+    """Return the (names, takes value, choices) tuple of the option word."""
+    for option in options:
+        if word in option[0]:
+            return option
+    return None
+
+def _environment_spec(words):
+    """Return the environment given with -E or --environment in words."""
+    spec = ""
+    for index, word in enumerate(words):
+        if word in ("-E", "--environment") and index + 1 < len(words):
+            spec = words[index + 1]
+        elif word.startswith("--environment="):
+            spec = word.split("=", 1)[1]
+    return spec
+
+def candidates(words, cword):
+    """Return completions of words[cword], words being the command line,
+    e.g. [ "p", "pquery", "--sel" ] and 2."""
+    from putils.applets import __all__ as applets
+
+    if cword < 1:
+        return []
+    current = words[cword] if cword < len(words) else ""
+    command = os.path.basename(words[0])
+    if command in applets:
+        applet = command
+    elif cword == 1:
+        return [ name for name in applets + [ "--help", "--version" ]
+                if name.startswith(current) ]
+    else:
+        applet = words[1]
+
+    spec = _environment_spec(words[:cword])
+    path = index_path(spec)
+    index = load_cache(path, COMPLETION_VERSION)
+    if index is None or index["generation"] != generation(index["locations"]):
+        _refresh_in_background(spec)
+    if index is None:
+        return []
+
+    options = index["applets"].get(applet, [])
+    previous = _option_spec(options, words[cword - 1])
+    if previous is not None and previous[1]:
+        # Value of an option
+        return [ choice for choice in previous[2]
+                if choice.startswith(current) ]
+    elif current.startswith("-"):
+        return sorted(name for names, takes_value, choices in options
+                for name in names if name.startswith(current))
+    elif "/" not in current:
+        return _prefixed(index["categories"], current)
+    return _prefixed(index["packages"], current)
+
+def complete(args):
+    """Print completions for the shell, args are the index of the word to
+    complete followed by the words of the command line."""
+    try:
+        cword = int(args[0])
+    except (IndexError, ValueError):
+        return 1
+    for candidate in candidates(args[1:], cword):
+        print(candidate)
+    return 0
+#}}}
+
+if __name__ == '__main__':
+    refresh_index(*sys.argv[1:2])
@@ -23,29 +23,212 @@
 from __future__ import generators
 
 import os
-import fnmatch
-import re
+from hashlib import sha1
 
 from paludis import (Filter, Generator, Log, LogLevel, LogContext,
-        MatchPackageOptions, Selection, VersionSpec, UserPackageDepSpecOption,
+        MatchPackageOptions, Selection, UserPackageDepSpecOption,
         parse_user_package_dep_spec)
+from paludis import (ContentsDirEntry, ContentsFileEntry, ContentsSymEntry,
+        ContentsOtherEntry)
 
+from putils.bloom import bloom_hashes
+from putils.pattern import path_matcher, pattern_literals
 from putils.util import rootjoin
 
-__all__ = [ "get_contents", "search_contents" ]
+# Bloom filters are checked for at most this many exact paths, testing more
+# keys per package costs more than parsing its contents.
+BLOOM_MAX_PATHS = 64
+
+__all__ = [ "content_metadata", "content_record", "content_type",
+        "content_type_names", "contents_digest", "contents_mtime",
+        "get_contents", "get_contents_records", "index_owners",
+        "installed_ids", "search_contents", "search_contents_many",
+        "search_contents_records" ]
+
+# Content types as returned by content_type()
+CONTENT_TYPES = { "dir" : ContentsDirEntry, "file" : ContentsFileEntry,
+        "sym" : ContentsSymEntry, "other" : ContentsOtherEntry }
+
+def content_type(content):
+    """Return the type of content as a string,
+    one of dir, file, sym and other."""
+    if isinstance(content, ContentsFileEntry):
+        return "file"
+    elif isinstance(content, ContentsDirEntry):
+        return "dir"
+    elif isinstance(content, ContentsSymEntry):
+        return "sym"
+    else:
+        return "other"
+
+def content_type_names(requested_instances):
+    """Convert requested instances to a list of content type names,
+    which unlike the classes can be passed to other processes."""
+    return [ name for name, cls in CONTENT_TYPES.iteritems()
+            if cls in requested_instances ] or [ "object" ]
+
+def _requested_instances(type_names):
+    """Inverse of content_type_names()."""
+    return [ CONTENT_TYPES.get(name, object) for name in type_names ]
+
+def content_record(package_id, content, root):
+    """Return content as a plain (package id, type, path, target) tuple.
+    target is None unless content is a symbolic link."""
+    record_type = content_type(content)
+    if record_type == "sym":
+        target = content.target_key().parse_value()
+    else:
+        target = None
+    return (str(package_id), record_type,
+            rootjoin(content.location_key().parse_value(), root), target)
+
+def contents_digest(entries):
+    """Return a digest of a package's contents given as (type, path,
+    target) tuples, e.g. content records without the package id.
+    The digest doesn't depend on the order of entries, so packages with
+    identical contents on different hosts have the same digest."""
+    digest = sha1()
+    for entry in sorted(entries):
+        digest.update("\0".join(field or "" for field in entry) + "\n")
+    return digest.hexdigest()
+
+def content_metadata(content, name):
+    """Return the value of the metadata key name of content, e.g. md5 or
+    mtime for files installed by a VDB repository, or None if content has no
+    such key."""
+    try:
+        key = content.find_metadata(name)
+    except AttributeError:
+        return None
+    if key is None:
+        return None
+
+    value = key.parse_value()
+    # Time keys return a Timestamp
+    return getattr(value, "seconds", value)
+
+def contents_mtime(package_id):
+    """Return the modification time of the CONTENTS file of an installed
+    package. Repositories without such a file, e.g. ones not laid out like
+    a VDB, fall back to the modification time of the package's location.
+    Returns None if the package has no location on disk.
+    The result can be used to check whether cached data is still valid."""
+    key = package_id.fs_location_key()
+    if key is None:
+        return None
+
+    location = str(key.parse_value())
+    for path in (os.path.join(location, "CONTENTS"), location):
+        try:
+            return os.stat(path).st_mtime
+        except OSError:
+            continue
+    return None
+
+def index_owners(index, patterns, matcher="exact", ignore_case=False):
+    """Return the set of package id strings owning a path matched by any of
+    patterns according to the trigram index, see putils.index."""
+    owners = set()
+    for pattern in patterns:
+        owners.update(index.owning_packages(
+            path_matcher(pattern, matcher, ignore_case),
+            pattern_literals(pattern, matcher)))
+    return owners
+
+def _cached_query(cache, query, compute):
+    """Yield the (extra, package_id, contents) tuples of query from cache,
+    see putils.querycache.QueryCache, or from compute() caching them once
+    all have been yielded. Results too large to cache aren't kept, so
+    streaming them needs no more memory than without a cache."""
+    from putils.querycache import MAX_RESULTS
+
+    results = cache.lookup(query)
+    if results is not None:
+        for result in results:
+            yield result
+        return
+
+    results = []
+    count = 0
+    for result in compute():
+        if results is not None:
+            count += len(result[2])
+            if count > MAX_RESULTS:
+                results = None
+            else:
+                results.append(result)
+        yield result
+    if results is not None:
+        cache.record(query, results)
+
+def _search_query(name, paths, matcher, ignore_case, requested_instances):
+    """Return the normalised cache key of a search."""
+    return (name, tuple(paths), matcher,
+            bool(ignore_case) and matcher in ("fnmatch", "regex"),
+            tuple(sorted(content_type_names(requested_instances))))
+
+def installed_ids(env, packages=None):
+    """Yield package ids of installed packages matching the package specs in
+    packages, or of all installed packages if packages is empty."""
+    filter_installed = Filter.InstalledAtRoot(env.root)
+    if not packages:
+        for package_id in env[Selection.AllVersionsUnsorted(
+            Generator.All() | filter_installed)]:
+            yield package_id
+        return
+
+    allow_wildcards = UserPackageDepSpecOption.ALLOW_WILDCARDS
+    for package in packages:
+        package_dep_spec = parse_user_package_dep_spec(package, env,
+                [allow_wildcards], filter_installed)
+        for package_id in env[Selection.AllVersionsUnsorted(
+            Generator.Matches(package_dep_spec, MatchPackageOptions()) |
+            filter_installed)]:
+            yield package_id
 
 def get_contents(package, env, source_repos = [],
         requested_instances = [object],
         selection = Selection.AllVersionsGroupedBySlot,
-        fnpattern = None, regexp = None, ignore_case = False):
-    """Get contents of package"""
+        fnpattern = None, regexp = None, ignore_case = False, index = None,
+        cache = None):
+    """Get contents of package
+    If index is a trigram index, see putils.index, packages which own no path
+    matching fnpattern and regexp are skipped without parsing their
+    contents. If cache is a putils.querycache.QueryCache, results are
+    served from and saved to it."""
+
+    if cache is not None:
+        query = ("get_contents", package, tuple(sorted(source_repos)),
+                tuple(sorted(content_type_names(requested_instances))),
+                selection.__name__, fnpattern, regexp,
+                bool(ignore_case) and (fnpattern, regexp) != (None, None))
+        for extra, package_id, contents in _cached_query(cache, query,
+                lambda: ((None, package_id, contents) for package_id, contents
+                    in get_contents(package, env, source_repos,
+                        requested_instances, selection, fnpattern, regexp,
+                        ignore_case, index))):
+            yield package_id, contents
+        return
 
     #{{{Pattern matching
+    instances = tuple(requested_instances)
+    patterns = []
+    if fnpattern is not None:
+        patterns.append(path_matcher(fnpattern, "fnmatch", ignore_case))
     if regexp is not None:
-        if ignore_case:
-            pattern = re.compile(regexp, re.IGNORECASE)
-        else:
-            pattern = re.compile(regexp)
+        patterns.append(path_matcher(regexp, "regex", ignore_case))
+
+    owners = None
+    if index is not None:
+        if fnpattern is not None:
+            owners = index_owners(index, [ fnpattern ], "fnmatch", ignore_case)
+        if regexp is not None:
+            regex_owners = index_owners(index, [ regexp ], "regex",
+                    ignore_case)
+            if owners is None:
+                owners = regex_owners
+            else:
+                owners &= regex_owners
     #}}}
 
     #{{{Get PackageDepSpec
@@ -59,6 +242,8 @@ def get_contents(package, env, source_repos = [],
     ids = env[selection(Generator.Matches(package_dep_spec, MatchPackageOptions()) | filter_installed)]
 
     for package_id in ids:
+        if owners is not None and str(package_id) not in owners:
+            continue
         if package_id.contents_key() is None:
             Log.instance.message("vdb.no_contents", LogLevel.WARNING,
                     LogContext.NO_CONTEXT,
@@ -80,21 +265,19 @@ def get_contents(package, env, source_repos = [],
 
             requested_contents = list()
             for content in package_id.contents_key().parse_value():
-                if not any([isinstance(content, i) for i in
-                    requested_instances]):
+                if not isinstance(content, instances):
                     continue
 
-                content_path = rootjoin(content.location_key().parse_value(), env.root)
-
-                if fnpattern is not None:
+                if patterns:
+                    content_path = rootjoin(
+                            content.location_key().parse_value(), env.root)
                     if ignore_case:
-                        if not fnmatch.fnmatchcase(content_path, fnpattern):
-                            continue
+                        folded = content_path.lower()
                     else:
-                        if not fnmatch.fnmatch(content_path, fnpattern):
-                            continue
-                if regexp is not None and pattern.search(content_path) is None:
-                    continue
+                        folded = None
+                    if not all(match(content_path, folded)
+                            for match in patterns):
+                        continue
                 requested_contents.append(content)
 
             yield package_id, requested_contents
@@ -102,47 +285,202 @@ def get_contents(package, env, source_repos = [],
 #}}}
 
 def search_contents(path, env, matcher="exact", ignore_case=False, #{{{
-        requested_instances=[object]):
-    """Search filename in contents of installed packages."""
+        requested_instances=[object], index=None, filters=None, cache=None):
+    """Search filename in contents of installed packages.
+    If index is a trigram index, see putils.index, only the contents of
+    packages owning a matching path are parsed.
+    If filters are putils.bloom.ContentsFilters and matcher is exact, only
+    the contents of packages whose filter may contain path are parsed.
+    If cache is a putils.querycache.QueryCache, results are served from and
+    saved to it."""
+
+    if cache is not None:
+        query = _search_query("search_contents", [ path ], matcher,
+                ignore_case, requested_instances)
+        for extra, package_id, contents in _cached_query(cache, query,
+                lambda: ((None, package_id, [ content ]) for package_id,
+                    content in search_contents(path, env, matcher,
+                        ignore_case, requested_instances, index, filters))):
+            yield package_id, contents[0]
+        return
 
     # Get package ids of all installed packages
     ids = env[Selection.AllVersionsGroupedBySlot(
         Generator.Matches.All() | Filter.InstalledAtRoot(env.root)
         )]
 
-    if matcher == "fnmatch":
-        if ignore_case:
-            fnmatch_matcher = fnmatch.fnmatchcase
-        else:
-            fnmatch_matcher = fnmatch.fnmatch
-    elif matcher == "regex":
-        if ignore_case:
-            regex_matcher = re.compile(path, re.IGNORECASE)
-        else:
-            regex_matcher = re.compile(path)
+    instances = tuple(requested_instances)
+    match = path_matcher(path, matcher, ignore_case)
+
+    owners = None
+    if index is not None:
+        owners = index_owners(index, [ path ], matcher, ignore_case)
+
+    hashes = None
+    if filters is not None and matcher == "exact":
+        hashes = [ bloom_hashes(path) ]
 
     for package_id in ids:
+        if owners is not None and str(package_id) not in owners:
+            continue
         if package_id.contents_key() is None:
             Log.instance.message("vdb.no_contents", LogLevel.WARNING,
                     LogContext.NO_CONTEXT,
                     "'%s' does not provide a contents key." % package_id.name)
+        elif (hashes is not None and
+                not filters.may_contain(package_id, hashes)):
+            continue
         else:
             for content in package_id.contents_key().parse_value():
-                if not True in [isinstance(content, i) for i in
-                        requested_instances]:
+                if not isinstance(content, instances):
                     continue
 
                 content_path = rootjoin(content.location_key().parse_value(), env.root)
 
-                if (matcher == "exact" and
-                        (path == content_path or
-                            path == os.path.basename(content_path))):
-                    yield package_id, content
-                elif matcher == "simple" and path in content_path:
-                    yield package_id, content
-                elif (matcher == "fnmatch" and
-                        fnmatch_matcher(content_path, path)):
-                    yield package_id, content
-                elif matcher == "regex" and regex_matcher.search(content_path):
+                if match(content_path):
                     yield package_id, content
+
+    if hashes is not None:
+        filters.save(prune = owners is None)
+#}}}
+
+def search_contents_many(paths, env, matcher="exact", ignore_case=False, #{{{
+        requested_instances=[object], index=None, filters=None, cache=None):
+    """Search many filenames in contents of installed packages.
+    Contents of installed packages are parsed once for all paths.
+    Yields (path, package_id, content) tuples.
+    See search_contents() for index, filters and cache. filters are used for
+    up to BLOOM_MAX_PATHS paths."""
+
+    paths = list(paths)
+
+    if cache is not None:
+        query = _search_query("search_contents_many", sorted(set(paths)),
+                matcher, ignore_case, requested_instances)
+        for path, package_id, contents in _cached_query(cache, query,
+                lambda: ((path, package_id, [ content ]) for path,
+                    package_id, content in search_contents_many(paths, env,
+                        matcher, ignore_case, requested_instances, index,
+                        filters))):
+            yield path, package_id, contents[0]
+        return
+
+    # Get package ids of all installed packages
+    ids = env[Selection.AllVersionsGroupedBySlot(
+        Generator.Matches.All() | Filter.InstalledAtRoot(env.root)
+        )]
+
+    #{{{Compile patterns once
+    instances = tuple(requested_instances)
+    fold = ignore_case and matcher in ("fnmatch", "regex")
+    hashes = None
+    if matcher == "exact":
+        exact_paths = frozenset(paths)
+        if filters is not None and len(exact_paths) <= BLOOM_MAX_PATHS:
+            hashes = [ bloom_hashes(path) for path in exact_paths ]
+    else:
+        patterns = [ (path, path_matcher(path, matcher, ignore_case))
+                for path in paths ]
+    #}}}
+
+    owners = None
+    if index is not None:
+        owners = index_owners(index, paths, matcher, ignore_case)
+
+    for package_id in ids:
+        if owners is not None and str(package_id) not in owners:
+            continue
+        if package_id.contents_key() is None:
+            Log.instance.message("vdb.no_contents", LogLevel.WARNING,
+                    LogContext.NO_CONTEXT,
+                    "'%s' does not provide a contents key." % package_id.name)
+            continue
+        if hashes is not None and not filters.may_contain(package_id, hashes):
+            continue
+
+        for content in package_id.contents_key().parse_value():
+            if not isinstance(content, instances):
+                continue
+
+            content_path = rootjoin(content.location_key().parse_value(), env.root)
+
+            if matcher == "exact":
+                if content_path in exact_paths:
+                    yield content_path, package_id, content
+                basename = os.path.basename(content_path)
+                if basename != content_path and basename in exact_paths:
+                    yield basename, package_id, content
+            else:
+                if fold:
+                    folded = content_path.lower()
+                else:
+                    folded = None
+                for path, match in patterns:
+                    if match(content_path, folded):
+                        yield path, package_id, content
+
+    if hashes is not None:
+        filters.save(prune = owners is None)
+#}}}
+
+def get_contents_records(env, packages, source_repos=[], #{{{
+        type_names=["object"], selection_name="AllVersionsGroupedBySlot",
+        fnpattern=None, regexp=None, ignore_case=False, use_index=False,
+        use_cache=False):
+    """Like get_contents() for several packages but returns a list of
+    content_record() tuples, see putils.parallel.map_environments().
+    If use_index is True the trigram index of env is used, if use_cache is
+    True the query cache of env is used."""
+    index = None
+    if use_index and (fnpattern is not None or regexp is not None):
+        from putils.index import get_index
+        index = get_index(env)
+    cache = None
+    if use_cache:
+        from putils.querycache import QueryCache
+        cache = QueryCache(env)
+
+    records = []
+    for package in packages:
+        for package_id, contents in get_contents(package, env, source_repos,
+                _requested_instances(type_names),
+                getattr(Selection, selection_name), fnpattern, regexp,
+                ignore_case, index, cache):
+            records.extend(content_record(package_id, content, env.root)
+                    for content in contents)
+    # Pool workers don't run exit handlers
+    if cache is not None:
+        cache.save()
+    return records
+#}}}
+
+def search_contents_records(env, paths, matcher="exact", ignore_case=False, #{{{
+        type_names=["object"], use_index=False, use_filters=False,
+        use_cache=False):
+    """Like search_contents_many() but returns a list of (path,
+    content_record()) tuples, see putils.parallel.map_environments().
+    If use_index is True the trigram index of env is used, if use_filters
+    is True the Bloom filters of env are used and if use_cache is True the
+    query cache of env is used."""
+    index = None
+    if use_index:
+        from putils.index import get_index
+        index = get_index(env)
+    filters = None
+    if use_filters:
+        from putils.bloom import ContentsFilters
+        filters = ContentsFilters(env)
+    cache = None
+    if use_cache:
+        from putils.querycache import QueryCache
+        cache = QueryCache(env)
+
+    records = [ (path, content_record(package_id, content, env.root))
+            for path, package_id, content in search_contents_many(paths, env,
+                matcher, ignore_case, _requested_instances(type_names),
+                index, filters, cache) ]
+    # Pool workers don't run exit handlers
+    if cache is not None:
+        cache.save()
+    return records
 #}}}
@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: set sw=4 ts=4 sts=4 et tw=80 fdm=indent :
+#
+# Copyright (c) 2026 Ali Polatel <alip@exherbo.org>
+#
+# This file is part of the paludis-utils. paludis-utils is free software; you
+# can redistribute it and/or modify it under the terms of the GNU General
+# Public License version 2, as published by the Free Software Foundation.
+#
+# paludis-utils is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 59 Temple
+# Place, Suite 330, Boston, MA  02111-1307  USA
+
+"""Minimal ELF reader for dynamic section information
+"""
+
+import struct
+from collections import namedtuple
+
+__all__ = [ "ELFInfo", "read_elf" ]
+
+ELFInfo = namedtuple("ELFInfo", "elf_class machine soname needed rpath runpath")
+
+ELF_MAGIC = "\x7fELF"
+ELFCLASS32 = 1
+ELFCLASS64 = 2
+ELFDATA2LSB = 1
+ELFDATA2MSB = 2
+
+PT_LOAD = 1
+PT_DYNAMIC = 2
+
+DT_NULL = 0
+DT_NEEDED = 1
+DT_STRTAB = 5
+DT_STRSZ = 10
+DT_SONAME = 14
+DT_RPATH = 15
+DT_RUNPATH = 29
+
+# struct formats by ELF class: header after e_ident, program header,
+# dynamic entry
+FORMATS = {
+        ELFCLASS32 : ("HHIIIIIHHHHHH", "IIIIIIII", "iI"),
+        ELFCLASS64 : ("HHIQQQIHHHHHH", "IIQQQQQQ", "qQ"),
+        }
+
+def _read_string(f, offset):
+    """Read a NUL terminated string at offset."""
+    f.seek(offset)
+    data = ""
+    while True:
+        chunk = f.read(256)
+        if not chunk:
+            return data
+        index = chunk.find("\0")
+        if index >= 0:
+            return data + chunk[:index]
+        data += chunk
+
+def read_elf(path):
+    """Read the dynamic section of ELF file path.
+    Returns an ELFInfo, or None if path isn't a dynamically linked ELF file
+    or can't be read."""
+    try:
+        with open(path, "rb") as f:
+            return _read_elf(f)
+    except (IOError, OSError, struct.error):
+        return None
+
+def _read_elf(f):
+    ident = f.read(16)
+    if len(ident) < 16 or not ident.startswith(ELF_MAGIC):
+        return None
+
+    elf_class = ord(ident[4])
+    if elf_class not in FORMATS:
+        return None
+    if ord(ident[5]) == ELFDATA2MSB:
+        endian = ">"
+    else:
+        endian = "<"
+    header_format, phdr_format, dyn_format = (endian + fmt
+            for fmt in FORMATS[elf_class])
+
+    header = struct.unpack(header_format,
+            f.read(struct.calcsize(header_format)))
+    e_machine, e_phoff, e_phentsize, e_phnum = (header[1], header[4],
+            header[8], header[9])
+
+    # Program headers, normalised to (type, offset, vaddr, filesz)
+    segments = []
+    for index in range(e_phnum):
+        f.seek(e_phoff + index * e_phentsize)
+        phdr = struct.unpack(phdr_format, f.read(struct.calcsize(phdr_format)))
+        if elf_class == ELFCLASS32:
+            p_type, p_offset, p_vaddr, p_filesz = phdr[0], phdr[1], phdr[2], phdr[4]
+        else:
+            p_type, p_offset, p_vaddr, p_filesz = phdr[0], phdr[2], phdr[3], phdr[5]
+        segments.append((p_type, p_offset, p_vaddr, p_filesz))
+
+    dynamic = [ segment for segment in segments if segment[0] == PT_DYNAMIC ]
+    if not dynamic:
+        return None
+    p_type, dyn_offset, dyn_vaddr, dyn_size = dynamic[0]
+
+    # Dynamic entries
+    entries = []
+    entry_size = struct.calcsize(dyn_format)
+    f.seek(dyn_offset)
+    data = f.read(dyn_size)
+    for index in range(0, len(data) - entry_size + 1, entry_size):
+        tag, value = struct.unpack(dyn_format, data[index:index + entry_size])
+        if tag == DT_NULL:
+            break
+        entries.append((tag, value))
+
+    # The string table is given as a virtual address, map it to the file.
+    strtab = None
+    for tag, value in entries:
+        if tag == DT_STRTAB:
+            for p_type, p_offset, p_vaddr, p_filesz in segments:
+                if p_type == PT_LOAD and p_vaddr <= value < p_vaddr + p_filesz:
+                    strtab = value - p_vaddr + p_offset
+                    break
+    if strtab is None:
+        return None
+
+    soname = None
+    needed = []
+    rpath = []
+    runpath = []
+    for tag, value in entries:
+        if tag == DT_NEEDED:
+            needed.append(_read_string(f, strtab + value))
+        elif tag == DT_SONAME:
+            soname = _read_string(f, strtab + value)
+        elif tag == DT_RPATH:
+            rpath.extend(_read_string(f, strtab + value).split(":"))
+        elif tag == DT_RUNPATH:
+            runpath.extend(_read_string(f, strtab + value).split(":"))
+
+    return ELFInfo(elf_class, e_machine, soname, tuple(needed), tuple(rpath),
+            tuple(runpath))
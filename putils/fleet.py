@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: set sw=4 ts=4 sts=4 et tw=80 fdm=indent :
+#
+# Copyright (c) 2026 Ali Polatel <alip@exherbo.org>
+#
+# This file is part of the paludis-utils. paludis-utils is free software; you
+# can redistribute it and/or modify it under the terms of the GNU General
+# Public License version 2, as published by the Free Software Foundation.
+#
+# paludis-utils is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 59 Temple
+# Place, Suite 330, Boston, MA  02111-1307  USA
+
+"""Portable contents indexes of many hosts
+"""
+
+import gzip
+import json
+import time
+
+from putils.content import contents_digest
+from putils.pattern import path_matcher
+
+__all__ = [ "FLEET_FORMAT", "FLEET_VERSION", "export_contents", "load_fleet",
+        "merge_fleets", "new_fleet", "query_fleet", "save_fleet" ]
+
+FLEET_FORMAT = "paludis-utils-fleet"
+# Bump when the layout changes, load_fleet() refuses newer versions
+FLEET_VERSION = 1
+
+def new_fleet():
+    """Return an empty fleet index.
+    A fleet index is a dictionary with the keys:
+        format, version: FLEET_FORMAT and FLEET_VERSION
+        contents: maps contents digests, see
+            putils.content.contents_digest(), to sorted lists of [ type,
+            path, target ] entries
+        hosts: maps host names to dictionaries with the root, the creation
+            time and the list of [ package id, contents digest ] pairs of
+            installed packages
+    Identical contents of packages on many hosts are stored once."""
+    return { "format" : FLEET_FORMAT, "version" : FLEET_VERSION,
+            "contents" : dict(), "hosts" : dict() }
+
+def export_contents(env, host):
+    """Return a fleet index of the packages installed to the root of env,
+    for host."""
+    from paludis import Selection
+    from putils.content import content_record, get_contents
+
+    fleet = new_fleet()
+    packages = []
+    for package_id, contents in get_contents("*/*", env,
+            selection = Selection.AllVersionsUnsorted):
+        entries = sorted(content_record(package_id, content, env.root)[1:]
+                for content in contents)
+        digest = contents_digest(entries)
+        fleet["contents"].setdefault(digest, entries)
+        packages.append((str(package_id), digest))
+
+    fleet["hosts"][host] = { "root" : env.root, "created" : int(time.time()),
+            "packages" : sorted(packages) }
+    return fleet
+
+def merge_fleets(fleets):
+    """Merge fleet indexes into a new one.
+    Hosts found in more than one index are taken from the last one."""
+    merged = new_fleet()
+    for fleet in fleets:
+        merged["hosts"].update(fleet["hosts"])
+        for digest, entries in fleet["contents"].iteritems():
+            merged["contents"].setdefault(digest, entries)
+
+    # Drop contents of hosts which were replaced
+    used = set(digest for host in merged["hosts"].itervalues()
+            for package, digest in host["packages"])
+    for digest in set(merged["contents"]) - used:
+        del merged["contents"][digest]
+    return merged
+
+def _to_str(value):
+    """Turn the unicode strings json returns back into the original byte
+    strings, see save_fleet()."""
+    if isinstance(value, unicode):
+        return value.encode("latin-1")
+    elif isinstance(value, list):
+        return [ _to_str(item) for item in value ]
+    elif isinstance(value, dict):
+        return dict((_to_str(key), _to_str(item))
+                for key, item in value.iteritems())
+    return value
+
+def load_fleet(path):
+    """Load a fleet index saved by save_fleet().
+    Raises ValueError if path isn't a fleet index or has a newer version."""
+    with gzip.open(path, "rb") as f:
+        try:
+            fleet = _to_str(json.load(f, encoding = "latin-1"))
+        except (IOError, ValueError), e:
+            raise ValueError("%s: not a fleet index: %s" % (path, e))
+
+    if not isinstance(fleet, dict) or fleet.get("format") != FLEET_FORMAT:
+        raise ValueError("%s: not a fleet index" % path)
+    if fleet.get("version") > FLEET_VERSION:
+        raise ValueError("%s: unsupported fleet index version %s" % (path,
+            fleet.get("version")))
+    return fleet
+
+def save_fleet(path, fleet):
+    """Save fleet as gzip compressed JSON.
+    Paths are byte strings of unknown encoding, they are stored as latin-1
+    so any path survives the round trip."""
+    with gzip.open(path, "wb") as f:
+        json.dump(fleet, f, encoding = "latin-1", separators = (",", ":"),
+                sort_keys = True)
+
+def query_fleet(fleet, patterns, matcher="exact", ignore_case=False):
+    """Search patterns, see putils.pattern.path_matcher(), in the contents
+    of all hosts of fleet.
+    Yields (pattern, host, package, type, path, target) tuples. Shared
+    contents are searched once for all hosts installing them."""
+    matchers = [ (pattern, path_matcher(pattern, matcher, ignore_case))
+            for pattern in patterns ]
+
+    matches = dict()
+    for digest, entries in fleet["contents"].iteritems():
+        found = [ (pattern, entry) for entry in entries
+                for pattern, match in matchers if match(entry[1]) ]
+        if found:
+            matches[digest] = found
+
+    for host in sorted(fleet["hosts"]):
+        for package, digest in fleet["hosts"][host]["packages"]:
+            for pattern, (entry_type, path, target) in matches.get(digest,
+                    ()):
+                yield pattern, host, package, entry_type, path, target
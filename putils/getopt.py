@@ -29,9 +29,7 @@ import textwrap
 from copy import copy
 from types import ListType, TupleType
 from optparse import (Option, OptionGroup, OptionParser, AmbiguousOptionError,
-        OptionError, OptionValueError)
-
-from paludis import Log, LogLevel, LogContext, Selection
+        OptionError, OptionValueError, SUPPRESS_HELP)
 
 __all__ = [ "PaludisOptionParser", "SmartOption", "version" ]
 
@@ -70,6 +68,8 @@ def _regex_strip_name(regexp):
 
 def check_regex_choice(option, opt, value):
     """Check regex_choice"""
+    from paludis import Log, LogLevel, LogContext
+
     for regexp in option.choices:
         choice_re = re.compile(regexp, option.regex_flag)
         m = choice_re.match(value)
@@ -132,6 +132,10 @@ class PaludisOptionParser(OptionParser, object):
     __options_format = False
     __options_query = False
 
+    # Environments used when none are given on the command line, set by
+    # pbatch for the commands it runs
+    default_environments = [ "" ]
+
     def __init__(self,
                  usage=None,
                  option_list=None,
@@ -152,13 +156,21 @@ class PaludisOptionParser(OptionParser, object):
                 callback = self.cb_version,
                 help = "Display program version")
         # Add common paludis options
-        self.add_option("-E", "--environment", action = "store",
-            dest = "environment", default = "",
-            help = "Environment specification")
+        self.add_option("-E", "--environment", action = "append",
+            dest = "environments", metavar = "ENVIRONMENT",
+            help = "Environment specification, may be given more than once")
         self.add_option("", "--log-level", type = "choice",
             choices = ["debug", "qa", "warning", "silent"],
             action = "store", dest = "log_level",
             help = "Specify the log level")
+        self.add_option("", "--profile", action = "store_true",
+            dest = "profile", default = False,
+            help = "Profile the program, --profile=FILE saves statistics to FILE")
+        self.add_option("", "--profile-file", dest = "profile_file",
+            help = SUPPRESS_HELP)
+        self.add_option("", "--timings", action = "store_true",
+            dest = "timings", default = False,
+            help = "Print time spent in every phase of the program")
 
         # Respect %PROG_OPTION environment variable
         environment_variable = self.get_prog_name().upper() + "_OPTIONS"
@@ -168,10 +180,37 @@ class PaludisOptionParser(OptionParser, object):
             "can be set for default command-line options."))
 
     def parse_args(self, args=None, values=None):
+        # optparse doesn't support optional option arguments,
+        # rewrite --profile=FILE as --profile-file=FILE
+        if args is None:
+            args = sys.argv[1:]
+        if "--" in args:
+            index = args.index("--")
+        else:
+            index = len(args)
+        args = [ arg.replace("--profile=", "--profile-file=", 1)
+                if arg.startswith("--profile=") else arg
+                for arg in args[:index] ] + args[index:]
+
         options, args = super(PaludisOptionParser, self).parse_args(args, values)
 
+        if options.profile or options.profile_file:
+            from putils.timing import start_profiling
+            start_profiling(options.profile_file)
+        if options.timings:
+            from putils.timing import timings
+            timings.report_at_exit()
+
+        # Import paludis only after --help had the chance to exit.
+        from paludis import Log, LogLevel, LogContext, Selection
+
         Log.instance.program_name = self.get_prog_name()
 
+        # Environments, the last one given is the default environment.
+        if not options.environments:
+            options.environments = list(self.default_environments)
+        options.environment = options.environments[-1]
+
         # Set log level
         if options.log_level:
             Log.instance.log_level = getattr(LogLevel,
@@ -289,6 +328,9 @@ sav|
                 help = "List only the files matching PATTERN using Unix shell-style wildcards")
         option_group_query.add_option("-i", "--ignore-case", action = "store_true",
                 dest = "ignore_case", help = "Ignore case distinctions in PATTERN")
+        option_group_query.add_option("-I", "--index", action = "store_true",
+                dest = "index", default = False,
+                help = "Use the trigram index of installed paths to find the packages owning files matching PATTERN, building it if it is missing or out of date")
 
         return self.add_option_group(option_group_query)
 
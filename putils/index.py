@@ -0,0 +1,376 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: set sw=4 ts=4 sts=4 et tw=80 fdm=indent :
+#
+# Copyright (c) 2026 Ali Polatel <alip@exherbo.org>
+#
+# This file is part of the paludis-utils. paludis-utils is free software; you
+# can redistribute it and/or modify it under the terms of the GNU General
+# Public License version 2, as published by the Free Software Foundation.
+#
+# paludis-utils is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 59 Temple
+# Place, Suite 330, Boston, MA  02111-1307  USA
+
+"""Trigram index of installed paths
+"""
+
+import mmap
+import os
+import struct
+from array import array
+from hashlib import sha1
+from tempfile import mkstemp
+
+from putils.util import get_cache_dir
+
+__all__ = [ "MappedTrigramIndex", "TrigramIndex", "build_index", "get_index",
+        "installed_generation", "load_index", "trigrams" ]
+
+# Bump when the layout of the index changes
+INDEX_VERSION = 2
+
+INDEX_MAGIC = "PUTRIGRM"
+# Unsigned 32 bit integers in native byte order, the index isn't shared
+# between machines
+UINT = "I" if array("I").itemsize == 4 else "L"
+# magic, key digest, number of trigrams, paths and packages and the offsets
+# of the sections, see TrigramIndex.save()
+HEADER = struct.Struct("=8s20s3Q8Q")
+
+def trigrams(string):
+    """Return the set of trigrams of the lower cased string."""
+    string = string.lower()
+    return set(string[i:i + 3] for i in xrange(len(string) - 2))
+
+class TrigramIndex(object):
+    """Index of the paths installed by packages.
+    Every trigram of a lower cased path maps to a sorted array of the
+    indexes of the paths containing it, so the paths containing a literal
+    of at least three characters are found by intersecting a few arrays
+    instead of testing every path."""
+
+    def __init__(self):
+        self.packages = []
+        self.paths = []
+        self.owners = []
+        self.postings = dict()
+        # Only needed while the index is built
+        self._path_indexes = dict()
+
+    def add(self, package, paths):
+        """Add paths installed by package, which is a package id string.
+        Must not be called after finish()."""
+        package_index = len(self.packages)
+        self.packages.append(package)
+
+        path_indexes = self._path_indexes
+        for path in paths:
+            path_index = path_indexes.get(path)
+            if path_index is None:
+                path_index = path_indexes[path] = len(self.paths)
+                self.paths.append(path)
+                self.owners.append([])
+            self.owners[path_index].append(package_index)
+
+    def finish(self):
+        """Compute posting arrays once all packages have been added."""
+        postings = self.postings
+        # Paths of a package come directory by directory, so the trigrams of
+        # the directory are reused and only those around and after the last
+        # / are computed for every path.
+        last_head, head_grams = None, None
+        for path_index, path in enumerate(self.paths):
+            split = path.rfind("/")
+            if split < 0:
+                grams = trigrams(path)
+            else:
+                head = path[:split]
+                if head != last_head:
+                    last_head, head_grams = head, trigrams(head)
+                grams = head_grams | trigrams(head[-2:] + path[split:])
+            for trigram in grams:
+                try:
+                    postings[trigram].append(path_index)
+                except KeyError:
+                    postings[trigram] = array(UINT, [ path_index ])
+        self.owners = [ tuple(owners) for owners in self.owners ]
+        del self._path_indexes
+
+    def __len__(self):
+        return len(self.paths)
+
+    def posting(self, trigram):
+        """Return the sorted array of indexes of paths containing trigram, or
+        None if no path contains it."""
+        return self.postings.get(trigram)
+
+    def path(self, path_index):
+        return self.paths[path_index]
+
+    def path_owners(self, path_index):
+        """Return the indexes in self.packages of the owners of a path."""
+        return self.owners[path_index]
+
+    def candidates(self, literals):
+        """Return the sorted list of indexes of paths which may contain all
+        literals, or None if no literal is long enough to narrow the search
+        and all paths are candidates."""
+        grams = set()
+        for literal in literals:
+            grams.update(trigrams(literal))
+        if not grams:
+            return None
+
+        postings = []
+        for trigram in grams:
+            posting = self.posting(trigram)
+            if posting is None:
+                return []
+            postings.append(posting)
+
+        postings.sort(key = len)
+        result = set(postings[0])
+        for posting in postings[1:]:
+            if len(result) * 8 < len(posting):
+                # Few candidates left, test them against the path instead
+                break
+            result.intersection_update(posting)
+            if not result:
+                break
+        return sorted(result)
+
+    def owning_packages(self, match, literals=[]):
+        """Return the set of package id strings owning a path for which
+        match returns True, see putils.pattern.path_matcher().
+        literals are strings contained in every matched path and are used
+        to narrow the search, see putils.pattern.pattern_literals()."""
+        candidates = self.candidates(literals)
+        if candidates is None:
+            candidates = xrange(len(self))
+
+        packages = self.packages
+        result = set()
+        for path_index in candidates:
+            if match(self.path(path_index)):
+                result.update(packages[i] for i in self.path_owners(path_index))
+        return result
+
+    def save(self, path, key):
+        """Write the index to path for MappedTrigramIndex, replacing it
+        atomically. key is stored as a digest and checked by load_index().
+        Sections are arrays of unsigned integers and strings:
+            sorted trigrams, 3 bytes each
+            start of the postings of every trigram in postings, and the end
+            postings, concatenated
+            start of every path in paths, and the end
+            paths, concatenated
+            start of the owners of every path in owners, and the end
+            owners, indexes of packages
+            start of every package in packages, and the end
+            packages, concatenated
+        Returns False if the index couldn't be written."""
+        grams = sorted(self.postings)
+
+        def offsets(lengths):
+            result = array(UINT, [ 0 ])
+            total = 0
+            for length in lengths:
+                total += length
+                result.append(total)
+            return result
+
+        dname = os.path.dirname(path)
+        tmp_path = None
+        try:
+            if not os.path.isdir(dname):
+                os.makedirs(dname, 0755)
+            fd, tmp_path = mkstemp(dir = dname, prefix = ".tmp-")
+            with os.fdopen(fd, "wb") as f:
+                f.write("\0" * HEADER.size)
+                sections = []
+
+                sections.append(f.tell())
+                f.write("".join(grams))
+                sections.append(f.tell())
+                offsets(len(self.postings[gram]) for gram in grams).tofile(f)
+                sections.append(f.tell())
+                for gram in grams:
+                    self.postings[gram].tofile(f)
+
+                sections.append(f.tell())
+                offsets(len(name) for name in self.paths).tofile(f)
+                sections.append(f.tell())
+                f.write("".join(self.paths))
+
+                sections.append(f.tell())
+                offsets(len(owners) for owners in self.owners).tofile(f)
+                sections.append(f.tell())
+                for owners in self.owners:
+                    array(UINT, owners).tofile(f)
+
+                sections.append(f.tell())
+                offsets(len(package) for package in self.packages).tofile(f)
+                f.write("".join(self.packages))
+
+                f.seek(0)
+                f.write(HEADER.pack(INDEX_MAGIC, sha1(repr(key)).digest(),
+                    len(grams), len(self.paths), len(self.packages),
+                    *sections))
+            os.rename(tmp_path, path)
+        except (IOError, OSError):
+            if tmp_path is not None and os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            return False
+        return True
+
+class MappedTrigramIndex(TrigramIndex):
+    """Trigram index saved by TrigramIndex.save() and mapped into memory.
+    Opening it reads the header and package names only, a query reads the
+    postings of its trigrams and the candidate paths, so it doesn't depend
+    on the size of the index."""
+
+    def __init__(self, f):
+        self.mapped = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+        (magic, self.digest, self.gram_count, self.path_count,
+                package_count, self.grams_offset, self.gram_index_offset,
+                self.postings_offset, self.path_index_offset,
+                self.paths_offset, self.owner_index_offset,
+                self.owners_offset, package_index_offset) = \
+                        HEADER.unpack_from(self.mapped)
+        if magic != INDEX_MAGIC:
+            raise ValueError("not a trigram index")
+        self._path_index = None
+        self._owner_index = None
+
+        package_index = self._uints(package_index_offset, 0,
+                package_count + 1)
+        packages_offset = package_index_offset + \
+                package_index.itemsize * len(package_index)
+        self.packages = [ self.mapped[packages_offset + start:
+            packages_offset + end] for start, end in zip(package_index,
+                package_index[1:]) ]
+
+    def _uints(self, section, start, end):
+        """Return the unsigned integers start to end of section."""
+        size = array(UINT).itemsize
+        return array(UINT, self.mapped[section + start * size:
+            section + end * size])
+
+    def __len__(self):
+        return self.path_count
+
+    def posting(self, trigram):
+        # Binary search in the sorted trigrams
+        mapped = self.mapped
+        offset = self.grams_offset
+        low, high = 0, self.gram_count
+        while low < high:
+            middle = (low + high) // 2
+            if mapped[offset + 3 * middle:offset + 3 * middle + 3] < trigram:
+                low = middle + 1
+            else:
+                high = middle
+        if low == self.gram_count or \
+                mapped[offset + 3 * low:offset + 3 * low + 3] != trigram:
+            return None
+        start, end = self._uints(self.gram_index_offset, low, low + 2)
+        return self._uints(self.postings_offset, start, end)
+
+    @property
+    def path_index(self):
+        """Start of every path, read when the first path is."""
+        if self._path_index is None:
+            self._path_index = self._uints(self.path_index_offset, 0,
+                    self.path_count + 1)
+        return self._path_index
+
+    @property
+    def owner_index(self):
+        """Start of the owners of every path, read when first needed."""
+        if self._owner_index is None:
+            self._owner_index = self._uints(self.owner_index_offset, 0,
+                    self.path_count + 1)
+        return self._owner_index
+
+    def path(self, path_index):
+        offset = self.paths_offset
+        return self.mapped[offset + self.path_index[path_index]:
+                offset + self.path_index[path_index + 1]]
+
+    def path_owners(self, path_index):
+        return self._uints(self.owners_offset, self.owner_index[path_index],
+                self.owner_index[path_index + 1])
+
+    def close(self):
+        self.mapped.close()
+
+def load_index(path, key):
+    """Return the MappedTrigramIndex saved to path with key, or None if it
+    is missing, damaged or was saved with another key."""
+    try:
+        with open(path, "rb") as f:
+            index = MappedTrigramIndex(f)
+    except (IOError, OSError, ValueError, struct.error, mmap.error):
+        return None
+    if index.digest != sha1(repr(key)).digest():
+        index.close()
+        return None
+    return index
+
+def installed_generation(env):
+    """Return a value which changes whenever packages are installed to or
+    uninstalled from the root of env.
+    It is made up of the modification times of the installed repositories
+    and their category directories, which change when package directories
+    are added or removed."""
+    from putils.vdb import installed_repositories
+
+    generation = []
+    for name, location in installed_repositories(env):
+        try:
+            categories = os.listdir(location)
+            generation.append((location, os.stat(location).st_mtime))
+        except OSError:
+            continue
+        for category in sorted(categories):
+            path = os.path.join(location, category)
+            try:
+                generation.append((path, os.stat(path).st_mtime))
+            except OSError:
+                continue
+    return sha1(repr(generation)).hexdigest()
+
+def build_index(env):
+    """Build the trigram index of paths installed to the root of env."""
+    from putils.content import installed_ids
+    from putils.util import rootjoin
+
+    index = TrigramIndex()
+    for package_id in installed_ids(env):
+        contents_key = package_id.contents_key()
+        if contents_key is None:
+            continue
+        index.add(str(package_id),
+                [ rootjoin(content.location_key().parse_value(), env.root)
+                    for content in contents_key.parse_value() ])
+    index.finish()
+    return index
+
+def get_index(env, update=True):
+    """Map the trigram index of the root of env from the cache directory.
+    If it is missing or out of date it is rebuilt and saved when update is
+    True, otherwise None is returned."""
+    path = get_cache_dir("trigrams-%s.index" % sha1(env.root).hexdigest()[:16])
+    key = (INDEX_VERSION, env.root, installed_generation(env))
+
+    index = load_index(path, key)
+    if index is None and update:
+        index = build_index(env)
+        index.save(path, key)
+    return index
@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: set sw=4 ts=4 sts=4 et tw=80 fdm=indent :
+#
+# Copyright (c) 2026 Ali Polatel <alip@exherbo.org>
+#
+# This file is part of the paludis-utils. paludis-utils is free software; you
+# can redistribute it and/or modify it under the terms of the GNU General
+# Public License version 2, as published by the Free Software Foundation.
+#
+# paludis-utils is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 59 Temple
+# Place, Suite 330, Boston, MA  02111-1307  USA
+
+"""Worker pools for I/O bound work
+"""
+
+import atexit
+import os
+import stat
+
+from multiprocessing import Pool, cpu_count
+from multiprocessing.pool import ThreadPool
+
+from putils.common import memoize
+
+__all__ = [ "default_workers", "get_process_pool", "get_thread_pool",
+        "group_by_directory", "list_directory", "map_environments",
+        "terminate_pools", "walk" ]
+
+# os.scandir is new in Python 3.5, use the backport if it's available.
+try:
+    from os import scandir
+except ImportError:
+    try:
+        from scandir import scandir
+    except ImportError:
+        scandir = None
+
+# Pools created by get_thread_pool()
+_pools = []
+
+def default_workers():
+    """Default number of workers for I/O bound pools.
+    Threads mostly wait for system calls so use more than the number of
+    processors."""
+    try:
+        return 4 * cpu_count()
+    except NotImplementedError:
+        return 4
+
+@memoize(maxsize=None)
+def get_thread_pool(workers=None):
+    """Return a shared thread pool with the given number of workers."""
+    if workers is None:
+        workers = default_workers()
+    pool = ThreadPool(workers)
+    _pools.append(pool)
+    return pool
+
+@memoize(maxsize=None)
+def get_process_pool(workers=None):
+    """Return a shared process pool for CPU bound work.
+    The default number of workers is the number of processors."""
+    pool = Pool(workers)
+    _pools.append(pool)
+    return pool
+
+def terminate_pools():
+    """Stop all pools created by get_thread_pool() and get_process_pool()
+    without waiting for outstanding work, e.g. when nobody reads the output
+    anymore."""
+    while _pools:
+        _pools.pop().terminate()
+    get_thread_pool.cache_clear()
+    get_process_pool.cache_clear()
+
+def _shutdown_pools():
+    """Terminate and join the pools still alive at exit, so the interpreter
+    doesn't shut down while their workers run."""
+    pools = list(_pools)
+    terminate_pools()
+    for pool in pools:
+        pool.join()
+
+atexit.register(_shutdown_pools)
+
+def group_by_directory(paths):
+    """Group paths by their parent directory.
+    Returns a list of (directory, [ path... ]) tuples, in the order the
+    directories are first seen."""
+    groups = dict()
+    directories = list()
+    for path in paths:
+        dname = os.path.dirname(path)
+        if dname not in groups:
+            groups[dname] = list()
+            directories.append(dname)
+        groups[dname].append(path)
+    return [ (dname, groups[dname]) for dname in directories ]
+
+def list_directory(path):
+    """List directory path without following symbolic links.
+    Returns a tuple of path and a list of (entry path, is directory) tuples,
+    the list is empty if the directory can't be read."""
+    entries = []
+    try:
+        if scandir is not None:
+            for entry in scandir(path):
+                entries.append((entry.path,
+                    entry.is_dir(follow_symlinks=False)))
+        else:
+            for name in os.listdir(path):
+                entry_path = os.path.join(path, name)
+                try:
+                    mode = os.lstat(entry_path).st_mode
+                except OSError:
+                    continue
+                entries.append((entry_path, stat.S_ISDIR(mode)))
+    except OSError:
+        pass
+    return path, entries
+
+def walk(paths, descend=None, workers=None):
+    """Walk directory trees in parallel, breadth first.
+    Yields (directory, entries) tuples as returned by list_directory() in no
+    particular order. If descend is given, a subdirectory is only walked if
+    descend(subdirectory) is True."""
+    pool = get_thread_pool(workers)
+    frontier = list(paths)
+    while frontier:
+        next_frontier = []
+        for path, entries in pool.imap_unordered(list_directory, frontier):
+            yield path, entries
+            next_frontier.extend(entry_path for entry_path, is_dir in entries
+                    if is_dir and (descend is None or descend(entry_path)))
+        frontier = next_frontier
+
+def _run_in_environment(args):
+    """Worker of map_environments()."""
+    from putils.util import get_environment
+
+    function, spec, function_args = args
+    env = get_environment(spec)
+    return spec, env.root, function(env, *function_args)
+
+def map_environments(function, specs, *args):
+    """Call function(env, *args) for the environment of every spec
+    concurrently, each in its own process with its own environment.
+    function must be defined at module level and return a picklable result.
+    Yields (spec, root, result) tuples as they are finished."""
+    specs = list(specs)
+    if len(specs) == 1:
+        yield _run_in_environment((function, specs[0], args))
+        return
+
+    pool = get_process_pool(min(len(specs), 2 * cpu_count()))
+    for result in pool.imap_unordered(_run_in_environment,
+            [ (function, spec, args) for spec in specs ]):
+        yield result
@@ -0,0 +1,237 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: set sw=4 ts=4 sts=4 et tw=80 fdm=indent :
+#
+# Copyright (c) 2026 Ali Polatel <alip@exherbo.org>
+#
+# This file is part of the paludis-utils. paludis-utils is free software; you
+# can redistribute it and/or modify it under the terms of the GNU General
+# Public License version 2, as published by the Free Software Foundation.
+#
+# paludis-utils is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 59 Temple
+# Place, Suite 330, Boston, MA  02111-1307  USA
+
+"""Pattern analysis functions
+"""
+
+import fnmatch
+import re
+import sre_parse
+from sre_constants import (ANY, AT, AT_BEGINNING, AT_BEGINNING_STRING,
+        AT_END, AT_END_STRING, LITERAL, MAXREPEAT, MAX_REPEAT, MIN_REPEAT,
+        SRE_FLAG_DOTALL, SRE_FLAG_IGNORECASE, SRE_FLAG_LOCALE,
+        SRE_FLAG_MULTILINE, SRE_FLAG_UNICODE, SUBPATTERN,
+        error as RegexError)
+
+__all__ = [ "MATCHERS", "analyse_regex", "path_matcher", "pattern_literals",
+        "required_literals" ]
+
+# Ways paths can be matched, see path_matcher()
+MATCHERS = [ "exact", "simple", "fnmatch", "regex" ]
+
+def _literals(parsed, literals):
+    """Append runs of literal characters in parsed, which every match of the
+    parsed pattern contains, to literals.
+    Returns the run which is still open at the end of parsed."""
+    run = []
+    for op, av in parsed:
+        if op == LITERAL:
+            run.append(unichr(av) if av > 0xff else chr(av))
+            continue
+
+        if run:
+            literals.append("".join(run))
+            run = []
+        if op == SUBPATTERN:
+            tail = _literals(av[1], literals)
+            if tail:
+                literals.append(tail)
+        elif op in (MAX_REPEAT, MIN_REPEAT) and av[0] > 0:
+            # The repeated item is there at least once
+            tail = _literals(av[2], literals)
+            if tail:
+                literals.append(tail)
+        # Anything else, e.g. branches, character classes or anchors, may
+        # match different strings and ends the run.
+    return "".join(run)
+
+def required_literals(regexp):
+    """Return a list of literal strings every match of regexp contains,
+    e.g. [ "/usr/", "bin" ] for "^/usr/.*bin".
+    The list is empty if no literal is required or regexp is invalid."""
+    try:
+        parsed = sre_parse.parse(regexp)
+    except (RegexError, OverflowError, RuntimeError):
+        return []
+
+    literals = []
+    tail = _literals(parsed, literals)
+    if tail:
+        literals.append(tail)
+    return literals
+
+def pattern_literals(pattern, matcher="exact"):
+    """Return a list of literal strings every path matched by pattern
+    contains, see path_matcher() for matchers."""
+    if matcher in ("exact", "simple"):
+        return [ pattern ]
+    elif matcher == "fnmatch":
+        return required_literals(fnmatch.translate(pattern))
+    elif matcher == "regex":
+        return required_literals(pattern)
+    raise ValueError("unknown matcher '%s'" % matcher)
+
+def _is_repeat(item, flags, any_string=False):
+    """Return True if item may repeat zero times.
+    If any_string is True, it must also be .* matching any string."""
+    op, av = item
+    if op not in (MAX_REPEAT, MIN_REPEAT) or av[0] != 0:
+        return False
+    if any_string:
+        return (av[1] == MAXREPEAT and list(av[2]) == [ (ANY, None) ] and
+                flags & SRE_FLAG_DOTALL)
+    return True
+
+def analyse_regex(regexp, anchored=False):
+    """Analyse regexp, which is matched like re.match() if anchored is True
+    and like re.search() otherwise. The strings matched are assumed not to
+    contain newlines, which holds for paths in CONTENTS.
+    Returns a (kind, literal, flags) tuple where flags are the inline flags
+    of regexp. kind is one of:
+        equal: regexp matches literal
+        prefix: regexp matches strings starting with literal
+        suffix: regexp matches strings ending with literal
+        substring: regexp matches strings containing literal
+        None: regexp needs the regular expression engine, literal is the
+            longest literal every match contains or None.
+    Raises re.error if regexp is invalid."""
+    parsed = sre_parse.parse(regexp)
+    flags = parsed.pattern.flags
+    items = list(parsed)
+
+    start = anchored
+    if items and items[0][0] == AT and (items[0][1] == AT_BEGINNING_STRING or
+            (items[0][1] == AT_BEGINNING and not flags & SRE_FLAG_MULTILINE)):
+        start = True
+        items = items[1:]
+    end = False
+    if items and items[-1][0] == AT and (items[-1][1] == AT_END_STRING or
+            (items[-1][1] == AT_END and not flags & SRE_FLAG_MULTILINE)):
+        end = True
+        items = items[:-1]
+
+    # Dropping something which may match the empty string at either end
+    # doesn't change whether a string is matched, unless the pattern is
+    # anchored there. .* matching any string drops the anchor too.
+    if items and _is_repeat(items[0], flags, start):
+        start = False
+        items = items[1:]
+    if items and _is_repeat(items[-1], flags, end):
+        end = False
+        items = items[:-1]
+
+    if items and all(op == LITERAL and av <= 0xff for op, av in items):
+        literal = "".join(chr(av) for op, av in items)
+        if start and end:
+            return "equal", literal, flags
+        elif start:
+            return "prefix", literal, flags
+        elif end:
+            return "suffix", literal, flags
+        return "substring", literal, flags
+
+    literals = []
+    tail = _literals(parsed, literals)
+    if tail:
+        literals.append(tail)
+    literals = [ literal for literal in literals if isinstance(literal, str) ]
+    if literals:
+        return None, max(literals, key = len), flags
+    return None, None, flags
+
+def path_matcher(pattern, matcher="exact", ignore_case=False):
+    """Return a function which takes a path and returns True if it is
+    matched by pattern. matcher is one of:
+        exact: pattern is the path or its basename
+        simple: pattern is a substring of the path
+        fnmatch: pattern is a shell wildcard matching the path
+        regex: pattern is a regular expression found in the path
+    ignore_case applies to the fnmatch and regex matchers.
+
+    Patterns are analysed and compiled once, see analyse_regex(). Literal
+    patterns are matched with string methods, others check the longest
+    literal they require before running the regular expression. The
+    function takes path.lower() as an optional second argument, so paths
+    matched against several case insensitive patterns are folded once."""
+    if matcher == "exact":
+        def match(path, folded=None):
+            return pattern == path or pattern == path[path.rfind("/") + 1:]
+        return match
+    elif matcher == "simple":
+        return lambda path, folded=None: pattern in path
+    elif matcher == "fnmatch":
+        regexp = fnmatch.translate(pattern)
+        anchored = True
+    elif matcher == "regex":
+        regexp = pattern
+        anchored = False
+    else:
+        raise ValueError("unknown matcher '%s'" % matcher)
+
+    if ignore_case:
+        compiled = re.compile(regexp, re.IGNORECASE)
+    else:
+        compiled = re.compile(regexp)
+    if anchored:
+        search = compiled.match
+    else:
+        search = compiled.search
+
+    try:
+        kind, literal, flags = analyse_regex(regexp, anchored)
+    except (OverflowError, RuntimeError):
+        kind, literal, flags = None, None, 0
+    fold = ignore_case or flags & SRE_FLAG_IGNORECASE
+    if fold:
+        if (flags & (SRE_FLAG_LOCALE | SRE_FLAG_UNICODE) or
+                (literal is not None and max(literal) > "\x7f")):
+            # Case folding isn't limited to ASCII
+            kind = literal = None
+        elif literal is not None:
+            literal = literal.lower()
+
+    if literal is None:
+        return lambda path, folded=None: search(path) is not None
+    elif kind is None:
+        if fold:
+            def match(path, folded=None):
+                if folded is None:
+                    folded = path.lower()
+                return literal in folded and search(path) is not None
+        else:
+            def match(path, folded=None):
+                return literal in path and search(path) is not None
+        return match
+
+    if kind == "equal":
+        check = literal.__eq__
+    elif kind == "prefix":
+        check = lambda path: path.startswith(literal)
+    elif kind == "suffix":
+        check = lambda path: path.endswith(literal)
+    else:
+        check = lambda path: literal in path
+
+    if fold:
+        def match(path, folded=None):
+            if folded is None:
+                folded = path.lower()
+            return check(folded)
+        return match
+    return lambda path, folded=None: check(path)
@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: set sw=4 ts=4 sts=4 et tw=80 fdm=indent :
+#
+# Copyright (c) 2026 Ali Polatel <alip@exherbo.org>
+#
+# This file is part of the paludis-utils. paludis-utils is free software; you
+# can redistribute it and/or modify it under the terms of the GNU General
+# Public License version 2, as published by the Free Software Foundation.
+#
+# paludis-utils is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 59 Temple
+# Place, Suite 330, Boston, MA  02111-1307  USA
+
+"""Cache of content query results
+"""
+
+import atexit
+from collections import OrderedDict
+from hashlib import sha1
+
+from paludis import (Filter, Generator, MatchPackageOptions, Selection,
+        parse_user_package_dep_spec)
+
+from putils.index import installed_generation
+from putils.util import get_cache_dir, load_cache, save_cache
+
+__all__ = [ "QueryCache" ]
+
+# Bump when the layout of cached results changes
+QUERY_CACHE_VERSION = 1
+# Number of queries to keep, least recently used ones are dropped first
+MAX_QUERIES = 256
+# Results with more contents aren't cached, reading CONTENTS again is no
+# slower than rehydrating them.
+MAX_RESULTS = 65536
+
+# Latest QueryCache of every cache file, saved at exit
+_caches = dict()
+
+def _save_caches():
+    for cache in _caches.values():
+        cache.save()
+
+atexit.register(_save_caches)
+
+def content_location(content):
+    """Return the location of content in CONTENTS as a string."""
+    return str(content.location_key().parse_value())
+
+class QueryCache(object):
+    """Results of content queries on the root of env, see
+    putils.content.get_contents() and search_contents().
+    Results are stored as package id strings and content locations and are
+    valid until a package is installed to or uninstalled from the root, see
+    putils.index.installed_generation(). Cached results are turned back
+    into package ids and contents by parsing CONTENTS of the packages in
+    the result only. Changes are saved once, by save(), when another
+    QueryCache of the same root is created or at exit."""
+
+    def __init__(self, env, cache=True):
+        self.env = env
+        self.cache = cache
+        # One file per root, so queries of other roots survive
+        self.path = get_cache_dir("queries-%s.pickle" %
+                sha1(env.root).hexdigest()[:16])
+        self.key = (QUERY_CACHE_VERSION, env.root, installed_generation(env))
+        self.queries = None
+        self.changed = False
+        if cache:
+            # Load what an earlier instance of this process recorded
+            previous = _caches.get(self.path)
+            if previous is not None:
+                previous.save()
+            self.queries = load_cache(self.path, self.key)
+            _caches[self.path] = self
+        if self.queries is None:
+            self.queries = OrderedDict()
+
+    def _package_id(self, package):
+        """Return the installed package id whose string is package."""
+        package_dep_spec = parse_user_package_dep_spec("=" + package,
+                self.env, [])
+        for package_id in self.env[Selection.AllVersionsUnsorted(
+            Generator.Matches(package_dep_spec, MatchPackageOptions()) |
+            Filter.InstalledAtRoot(self.env.root))]:
+            if str(package_id) == package:
+                return package_id
+        raise KeyError(package)
+
+    def lookup(self, query):
+        """Return the cached results of query as a list of (extra,
+        package_id, contents) tuples, see record(), or None if query
+        isn't cached."""
+        entries = self.queries.pop(query, None)
+        if entries is None:
+            return None
+        self.queries[query] = entries
+
+        packages = dict()
+        results = []
+        try:
+            for extra, package, locations in entries:
+                if package not in packages:
+                    package_id = self._package_id(package)
+                    packages[package] = (package_id, dict(
+                        (content_location(content), content) for content in
+                        package_id.contents_key().parse_value()))
+                package_id, contents = packages[package]
+                results.append((extra, package_id,
+                    [ contents[location] for location in locations ]))
+        except (KeyError, AttributeError):
+            # Changed without changing the generation, e.g. by hand
+            del self.queries[query]
+            self.changed = True
+            return None
+        return results
+
+    def record(self, query, results):
+        """Cache results of query, a list of (extra, package_id, contents)
+        tuples. extra is a picklable value, e.g. the path a content was
+        found for, and contents is a list of contents of package_id."""
+        entries = [ (extra, str(package_id),
+            [ content_location(content) for content in contents ])
+            for extra, package_id, contents in results ]
+        if sum(len(locations) for extra, package, locations in
+                entries) > MAX_RESULTS:
+            return
+
+        self.queries.pop(query, None)
+        self.queries[query] = entries
+        while len(self.queries) > MAX_QUERIES:
+            self.queries.popitem(last = False)
+        self.changed = True
+
+    def save(self):
+        """Save the cache if queries were recorded since it was loaded."""
+        if self.cache and self.changed:
+            save_cache(self.path, self.queries, self.key)
+            self.changed = False
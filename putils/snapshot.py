@@ -0,0 +1,253 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: set sw=4 ts=4 sts=4 et tw=80 fdm=indent :
+#
+# Copyright (c) 2026 Ali Polatel <alip@exherbo.org>
+#
+# This file is part of the paludis-utils. paludis-utils is free software; you
+# can redistribute it and/or modify it under the terms of the GNU General
+# Public License version 2, as published by the Free Software Foundation.
+#
+# paludis-utils is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 59 Temple
+# Place, Suite 330, Boston, MA  02111-1307  USA
+
+"""Content addressed snapshots of installed packages
+"""
+
+import gzip
+import json
+import os
+import time
+from hashlib import sha1
+from tempfile import mkstemp
+
+from putils.util import get_cache_dir, load_cache, save_cache
+
+__all__ = [ "SNAPSHOT_FORMAT", "SNAPSHOT_VERSION", "ContentsStore",
+        "create_snapshot", "diff_snapshots", "load_snapshot", "save_snapshot",
+        "store_path" ]
+
+SNAPSHOT_FORMAT = "paludis-utils-snapshot"
+# Bump when the layout changes, load_snapshot() refuses newer versions
+SNAPSHOT_VERSION = 2
+
+def store_path(snapshot_path):
+    """Return the default store of the snapshot saved to snapshot_path, a
+    directory next to it shared by all snapshots in the same directory."""
+    return os.path.join(os.path.dirname(os.path.abspath(snapshot_path)),
+            "psnapshot-objects")
+
+class ContentsStore(object):
+    """Package contents stored by digest, see putils.content.contents_digest().
+    Each object is a sorted list of (type, path, target, md5) tuples in its
+    own gzip compressed JSON file under path, so identical contents are
+    stored once for all snapshots using the store. Stores hold data only
+    and are kept with the snapshots, see store_path(), so they outlive the
+    cache directory. The digests of packages installed to each root are
+    remembered in the cache directory together with the modification time
+    of their CONTENTS, so only packages changed since the last snapshot of
+    the root are read again."""
+
+    def __init__(self, path):
+        self.path = path
+        self._digests = dict()
+
+    def digests_path(self, root):
+        return get_cache_dir("snapshots", "digests-%s.pickle" %
+                sha1(root).hexdigest()[:16])
+
+    def digests(self, root):
+        """Return the remembered digests of packages installed to root."""
+        if root not in self._digests:
+            digests = load_cache(self.digests_path(root),
+                    (SNAPSHOT_VERSION, root))
+            if digests is None:
+                digests = dict()
+            self._digests[root] = digests
+        return self._digests[root]
+
+    def object_path(self, digest):
+        return os.path.join(self.path, digest[:2], digest[2:] + ".json.gz")
+
+    def has(self, digest):
+        return os.path.exists(self.object_path(digest))
+
+    def load(self, digest):
+        """Return the contents stored as digest.
+        Raises IOError if the store doesn't have them."""
+        try:
+            with gzip.open(self.object_path(digest), "rb") as f:
+                entries = json.load(f, encoding = "latin-1")
+        except (IOError, ValueError):
+            raise IOError("%s: contents %s not found" % (self.path, digest))
+        # Paths are byte strings of unknown encoding, see store()
+        return [ tuple(field if field is None else field.encode("latin-1")
+            for field in entry) for entry in entries ]
+
+    def store(self, entries):
+        """Store entries unless they're stored already and return their
+        digest. Raises IOError if the object can't be written."""
+        from putils.content import contents_digest
+
+        digest = contents_digest(entries)
+        if self.has(digest):
+            return digest
+
+        path = self.object_path(digest)
+        dname = os.path.dirname(path)
+        tmp_path = None
+        try:
+            if not os.path.isdir(dname):
+                os.makedirs(dname)
+            fd, tmp_path = mkstemp(dir = dname, prefix = ".tmp-")
+            with os.fdopen(fd, "wb") as raw:
+                with gzip.GzipFile(fileobj = raw, mode = "wb") as f:
+                    # latin-1 maps every byte, so any path survives the
+                    # round trip
+                    json.dump(sorted(entries), f, encoding = "latin-1",
+                            separators = (",", ":"))
+            os.chmod(tmp_path, 0644)
+            os.rename(tmp_path, path)
+        except (IOError, OSError), e:
+            if tmp_path is not None and os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise IOError("%s: failed to store contents %s: %s" % (self.path,
+                digest, e))
+        return digest
+
+    def package_digest(self, package_id, root):
+        """Return the digest of the contents of package_id, reading them only
+        if its CONTENTS changed since the digest was last computed.
+        md5 is the checksum of files recorded in CONTENTS, None for other
+        entries, so rebuilt files change the digest too."""
+        from putils.content import (content_metadata, content_record,
+                contents_mtime)
+
+        package = str(package_id)
+        mtime = contents_mtime(package_id)
+        digests = self.digests(root)
+        entry = digests.get(package)
+        if entry is not None and mtime is not None and entry[0] == mtime \
+                and self.has(entry[1]):
+            return entry[1]
+
+        contents_key = package_id.contents_key()
+        if contents_key is None:
+            contents = []
+        else:
+            contents = contents_key.parse_value()
+        entries = []
+        for content in contents:
+            record = content_record(package_id, content, root)
+            if record[1] == "file":
+                md5 = content_metadata(content, "md5")
+            else:
+                md5 = None
+            entries.append(record[1:] + (md5,))
+        digest = self.store(entries)
+        digests[package] = (mtime, digest)
+        return digest
+
+    def save(self, root, packages):
+        """Save the remembered digests of packages installed to root,
+        forgetting the others."""
+        if root not in self._digests:
+            return
+        digests = self._digests[root]
+        for package in set(digests) - set(packages):
+            del digests[package]
+        save_cache(self.digests_path(root), digests, (SNAPSHOT_VERSION, root))
+
+def create_snapshot(env, store):
+    """Return a snapshot of the packages installed to the root of env.
+    The contents are added to store, a ContentsStore. A snapshot is a
+    dictionary with the keys:
+        format, version: SNAPSHOT_FORMAT and SNAPSHOT_VERSION
+        root, created: the root of env and the creation time
+        packages: sorted list of [ package id, contents digest ] pairs"""
+    from putils.content import installed_ids
+
+    packages = sorted((str(package_id), store.package_digest(package_id,
+        env.root)) for package_id in installed_ids(env))
+    store.save(env.root, (package for package, digest in packages))
+    return { "format" : SNAPSHOT_FORMAT, "version" : SNAPSHOT_VERSION,
+            "root" : env.root, "created" : int(time.time()),
+            "packages" : packages }
+
+def load_snapshot(path):
+    """Load a snapshot saved by save_snapshot().
+    Raises ValueError if path isn't a snapshot or has a newer version."""
+    with gzip.open(path, "rb") as f:
+        try:
+            snapshot = json.load(f)
+        except (IOError, ValueError), e:
+            raise ValueError("%s: not a snapshot: %s" % (path, e))
+
+    if not isinstance(snapshot, dict) or \
+            snapshot.get("format") != SNAPSHOT_FORMAT:
+        raise ValueError("%s: not a snapshot" % path)
+    if snapshot.get("version") > SNAPSHOT_VERSION:
+        raise ValueError("%s: unsupported snapshot version %s" % (path,
+            snapshot.get("version")))
+    # Package ids and digests are ASCII
+    snapshot["packages"] = [ (str(package), str(digest))
+            for package, digest in snapshot["packages"] ]
+    snapshot["root"] = str(snapshot["root"])
+    return snapshot
+
+def save_snapshot(path, snapshot):
+    """Save snapshot as gzip compressed JSON."""
+    with gzip.open(path, "wb") as f:
+        json.dump(snapshot, f, separators = (",", ":"), sort_keys = True)
+
+def diff_snapshots(old, new, old_store, new_store=None):
+    """Compare two snapshots whose contents are in old_store and new_store,
+    which defaults to old_store.
+    Returns a tuple (removed, added, changed, paths): the sorted lists of
+    package ids only in old, only in new and with different contents in
+    both, and a sorted list of (status, path, type, target, package) tuples
+    where status is "-" for removed, "+" for added and "~" for paths whose
+    type, target or md5 changed. package is the new owner unless the path was
+    removed.
+    Packages with the same digest in both snapshots are never loaded, so
+    the work done depends on what changed only. Paths which moved between
+    packages unchanged aren't reported, paths of removed packages which an
+    unchanged package installs too are."""
+    old_packages = dict(old["packages"])
+    new_packages = dict(new["packages"])
+    removed = sorted(set(old_packages) - set(new_packages))
+    added = sorted(set(new_packages) - set(old_packages))
+    changed = sorted(package for package in set(old_packages) &
+            set(new_packages) if old_packages[package] != new_packages[package])
+
+    if new_store is None:
+        new_store = old_store
+
+    def entries(packages, digests, store):
+        paths = dict()
+        for package in packages:
+            for entry_type, path, target, md5 in store.load(
+                    digests[package]):
+                paths[path] = (entry_type, target, md5, package)
+        return paths
+
+    old_paths = entries(removed + changed, old_packages, old_store)
+    new_paths = entries(added + changed, new_packages, new_store)
+
+    paths = []
+    for path, (entry_type, target, md5, package) in old_paths.iteritems():
+        if path not in new_paths:
+            paths.append(("-", path, entry_type, target, package))
+    for path, (entry_type, target, md5, package) in new_paths.iteritems():
+        if path not in old_paths:
+            paths.append(("+", path, entry_type, target, package))
+        elif old_paths[path][:3] != (entry_type, target, md5):
+            paths.append(("~", path, entry_type, target, package))
+    paths.sort(key = lambda change: (change[1], change[0]))
+    return removed, added, changed, paths
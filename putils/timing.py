@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: set sw=4 ts=4 sts=4 et tw=80 fdm=indent :
+#
+# Copyright (c) 2026 Ali Polatel <alip@exherbo.org>
+#
+# This file is part of the paludis-utils. paludis-utils is free software; you
+# can redistribute it and/or modify it under the terms of the GNU General
+# Public License version 2, as published by the Free Software Foundation.
+#
+# paludis-utils is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 59 Temple
+# Place, Suite 330, Boston, MA  02111-1307  USA
+
+"""Phase timing and profiling for applets
+"""
+
+from __future__ import print_function
+
+import atexit
+import os
+import sys
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+__all__ = [ "Timings", "timings", "start_profiling" ]
+
+def _cpu_time():
+    """User and system CPU time of the process."""
+    user, system = os.times()[:2]
+    return user + system
+
+class Timings(object):
+    """Accumulate wall and CPU time spent in named phases."""
+
+    def __init__(self):
+        self.start = time.time()
+        self.start_cpu = _cpu_time()
+        # name -> [ wall time, cpu time, count ]
+        self.phases = OrderedDict()
+        self.reporting = False
+
+    def add(self, name, wall, cpu):
+        """Add time spent in phase name."""
+        if name not in self.phases:
+            self.phases[name] = [ 0.0, 0.0, 0 ]
+        self.phases[name][0] += wall
+        self.phases[name][1] += cpu
+        self.phases[name][2] += 1
+
+    @contextmanager
+    def phase(self, name):
+        """Context manager timing the code it wraps as phase name."""
+        start, start_cpu = time.time(), _cpu_time()
+        try:
+            yield
+        finally:
+            self.add(name, time.time() - start, _cpu_time() - start_cpu)
+
+    def iterate(self, name, iterable):
+        """Iterate over iterable, timing every step as phase name.
+        Time spent by the caller between steps isn't counted, so lazy
+        producers can be timed separately from their consumers."""
+        iterator = iter(iterable)
+        while True:
+            start, start_cpu = time.time(), _cpu_time()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.add(name, time.time() - start, _cpu_time() - start_cpu)
+                return
+            self.add(name, time.time() - start, _cpu_time() - start_cpu)
+            yield item
+
+    def report(self, outfd=sys.stderr):
+        """Print the time spent in every phase."""
+        print("Timings:", file=outfd)
+        for name, (wall, cpu, count) in self.phases.items():
+            print("  %-20s wall %8.3fs  cpu %8.3fs  (%d)" % (name, wall, cpu,
+                count), file=outfd)
+        print("  %-20s wall %8.3fs  cpu %8.3fs" % ("total",
+            time.time() - self.start, _cpu_time() - self.start_cpu),
+            file=outfd)
+
+    def report_at_exit(self):
+        """Print the report when the process exits."""
+        if not self.reporting:
+            self.reporting = True
+            atexit.register(self.report)
+
+# Timings shared by all modules of the process
+timings = Timings()
+
+_profiler = None
+
+def start_profiling(filename=None):
+    """Profile the rest of the process using cProfile.
+    Statistics are saved to filename when the process exits or printed to
+    standard error if filename is None."""
+    global _profiler
+    if _profiler is not None:
+        return
+
+    import cProfile
+    _profiler = cProfile.Profile()
+
+    def stop_profiling():
+        _profiler.disable()
+        if filename is not None:
+            _profiler.dump_stats(filename)
+        else:
+            import pstats
+            stats = pstats.Stats(_profiler, stream=sys.stderr)
+            stats.sort_stats("cumulative").print_stats(30)
+
+    atexit.register(stop_profiling)
+    _profiler.enable()
@@ -20,11 +20,24 @@
 """Common utilities
 """
 
-__all__ = [ "rootjoin", "setup_pager" ]
+__all__ = [ "rootjoin", "setup_pager", "disable_pager", "Output",
+        "PagerClosed", "get_environment", "get_cache_dir", "load_cache",
+        "save_cache" ]
 
+import errno
 import os
+import stat
 import sys
+import threading
+import time
+import cPickle as pickle
 from subprocess import Popen, PIPE
+from tempfile import mkstemp
+
+from putils.common import memoize
+
+# Set by disable_pager()
+_pager_disabled = False
 
 def rootjoin(path, root):
     """Smartly join path and root so there's no more than one / between them."""
@@ -44,7 +57,7 @@ def rootjoin(path, root):
 
 def setup_pager():
     """Setup pager to pipe output."""
-    if not sys.stdout.isatty():
+    if _pager_disabled or not sys.stdout.isatty():
         # Not a tty, do nothing
         return None, sys.stdout
 
@@ -58,3 +71,216 @@ def setup_pager():
     proc = Popen(pager, stdin = PIPE, stdout = sys.stdout, stderr = sys.stderr)
     return proc, proc.stdin
 
+class PagerClosed(Exception):
+    """Raised by Output when the reader of the output went away."""
+
+class Output(object):
+    """Buffered output to the pager set up by setup_pager().
+
+    Output is written in large chunks, but never stays buffered longer than
+    flush_interval seconds, even if the producer writes nothing more, so
+    the pager shows it incrementally. When the pager exits or
+    writing fails with EPIPE, the pools of putils.parallel are terminated and
+    PagerClosed is raised so producers stop right away. If the flush timer
+    notices it, this happens on the next write(), in the producer's thread."""
+
+    def __init__(self, buffer_size=65536, flush_interval=0.1):
+        self.proc, self.outfd = setup_pager()
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self.buffer = []
+        self.buffered = 0
+        self.last_flush = time.time()
+        self.closed = False
+        # Flushes from the timer thread and writes don't interleave
+        self.lock = threading.RLock()
+        self.timer = None
+        # Set by the timer thread, which must not terminate the pools the
+        # producer may be waiting for
+        self.pager_gone = False
+
+    def isatty(self):
+        """True if output goes to a pager or a terminal."""
+        return self.proc is not None or self.outfd.isatty()
+
+    def write(self, data):
+        with self.lock:
+            if self.pager_gone:
+                self.cancel()
+            if self.closed:
+                raise PagerClosed()
+
+            self.buffer.append(data)
+            self.buffered += len(data)
+            if (self.buffered >= self.buffer_size or
+                    time.time() - self.last_flush >= self.flush_interval):
+                self._flush()
+            elif self.timer is None:
+                self.timer = threading.Timer(self.flush_interval,
+                        self._timed_flush)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def _timed_flush(self):
+        """Flush output buffered since the timer was started."""
+        with self.lock:
+            self.timer = None
+            if self.closed or not self.buffer:
+                return
+            try:
+                self._flush(from_timer = True)
+            except PagerClosed:
+                pass
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def _flush(self, from_timer=False):
+        if self.closed:
+            raise PagerClosed()
+        if self.pager_gone and not from_timer:
+            self.cancel()
+        if self.proc is not None and self.proc.poll() is not None:
+            # User quit the pager
+            self._reader_gone(from_timer)
+
+        data = "".join(self.buffer)
+        self.buffer = []
+        self.buffered = 0
+        self.last_flush = time.time()
+        try:
+            self.outfd.write(data)
+            self.outfd.flush()
+        except IOError, e:
+            if e.errno != errno.EPIPE:
+                raise
+            self._reader_gone(from_timer)
+
+    def _reader_gone(self, from_timer):
+        """Stop writing, cancel() right away unless called by the timer."""
+        if not from_timer:
+            self.cancel()
+        self.pager_gone = True
+        self.buffer = []
+        self.buffered = 0
+        raise PagerClosed()
+
+    def cancel(self):
+        """Stop all work, nobody reads the output anymore."""
+        from putils.parallel import terminate_pools
+
+        self.closed = True
+        self.buffer = []
+        terminate_pools()
+        raise PagerClosed()
+
+    def stream(self, lines, end="\n"):
+        """Write lines from an iterable, each followed by end.
+        If the reader goes away, lines is closed if it's a generator.
+        Returns False in that case and True otherwise."""
+        try:
+            for line in lines:
+                self.write(line + end)
+        except PagerClosed:
+            if hasattr(lines, "close"):
+                lines.close()
+            return False
+        return True
+
+    def close(self):
+        """Flush output and wait for the pager.
+        Returns the exit status of the pager or 0."""
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+        if not self.closed:
+            try:
+                self.flush()
+            except PagerClosed:
+                pass
+        self.closed = True
+
+        if self.proc is None:
+            return 0
+        try:
+            self.outfd.close()
+        except IOError:
+            pass
+        return self.proc.wait()
+
+def disable_pager():
+    """Make setup_pager() write to standard output directly."""
+    global _pager_disabled
+    _pager_disabled = True
+
+@memoize(maxsize=None)
+def _create_environment(spec):
+    from paludis import EnvironmentFactory
+    return EnvironmentFactory.instance.create(spec)
+
+def get_environment(spec=""):
+    """Create the paludis environment for spec.
+    Environments are created once per process and shared by callers."""
+    # get_environment(), get_environment("") and get_environment(None) must
+    # share one memoized environment
+    return _create_environment(spec or "")
+
+def get_cache_dir(*names):
+    """Return the cache directory of paludis-utils.
+    Respects XDG_CACHE_HOME, names are joined as subdirectories.
+    The directory is created by save_cache() when needed."""
+    if os.environ.get("XDG_CACHE_HOME"):
+        base = os.environ["XDG_CACHE_HOME"]
+    else:
+        base = os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "paludis-utils", *names)
+
+def _trusted(st):
+    """True if st is the status of a file only the effective user can
+    change. Unpickling a file others can write would run their code, e.g.
+    when running as root with the HOME of a user."""
+    return (st.st_uid == os.geteuid() and
+            not st.st_mode & (stat.S_IWGRP | stat.S_IWOTH))
+
+def load_cache(path, key=None):
+    """Load data saved by save_cache() in one read.
+    Returns None if the file doesn't exist, can't be read, was saved with
+    a different key or it or its directory isn't owned by the effective
+    user or is writable by others."""
+    try:
+        if not _trusted(os.stat(os.path.dirname(path))):
+            return None
+        with open(path, "rb") as f:
+            if not _trusted(os.fstat(f.fileno())):
+                return None
+            saved_key, data = pickle.loads(f.read())
+    except Exception:
+        return None
+
+    if saved_key != key:
+        return None
+    return data
+
+def save_cache(path, data, key=None):
+    """Pickle data together with key to path.
+    The file is replaced atomically so readers never see partial data.
+    Returns False if the cache couldn't be written or load_cache() would
+    refuse it."""
+    dname = os.path.dirname(path)
+    tmp_path = None
+    try:
+        if not os.path.isdir(dname):
+            os.makedirs(dname, 0755)
+        if not _trusted(os.stat(dname)):
+            return False
+        fd, tmp_path = mkstemp(dir = dname, prefix = ".tmp-")
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump((key, data), f, pickle.HIGHEST_PROTOCOL)
+        os.rename(tmp_path, path)
+    except (IOError, OSError, pickle.PicklingError):
+        if tmp_path is not None and os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        return False
+    return True
@@ -0,0 +1,279 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: set sw=4 ts=4 sts=4 et tw=80 fdm=indent :
+#
+# Copyright (c) 2026 Ali Polatel <alip@exherbo.org>
+#
+# This file is part of the paludis-utils. paludis-utils is free software; you
+# can redistribute it and/or modify it under the terms of the GNU General
+# Public License version 2, as published by the Free Software Foundation.
+#
+# paludis-utils is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 59 Temple
+# Place, Suite 330, Boston, MA  02111-1307  USA
+
+"""Direct access to installed package databases
+"""
+
+import os
+
+from putils.inotify import (IN_CLOSE_WRITE, IN_CREATE, IN_DELETE, IN_IGNORED,
+        IN_ISDIR, IN_MOVED_FROM, IN_MOVED_TO, IN_ONLYDIR, IN_Q_OVERFLOW)
+from putils.pattern import path_matcher
+from putils.util import rootjoin
+
+__all__ = [ "OwnerMap", "installed_repositories", "parse_contents" ]
+
+# Content types of CONTENTS entries, as returned by
+# putils.content.content_type()
+ENTRY_TYPES = { "dir" : "dir", "obj" : "file", "sym" : "sym" }
+
+# Events watched in repository and category directories
+DIRECTORY_MASK = (IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO |
+        IN_ONLYDIR)
+# Events watched in package directories
+PACKAGE_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_ONLYDIR
+
+def installed_repositories(env):
+    """Return a list of (name, location) tuples of the repositories of env
+    which packages are installed to."""
+    repositories = []
+    for repository in env.repositories:
+        if repository.installed_root_key() is None:
+            continue
+        location_key = repository.location_key()
+        if location_key is None:
+            continue
+        repositories.append((str(repository.name),
+            str(location_key.parse_value())))
+    return repositories
+
+def parse_contents(path):
+    """Parse the CONTENTS file at path.
+    Yields (type, location, target) tuples, type is one of dir, file, sym
+    and other and target is None unless the entry is a symbolic link."""
+    with open(path) as f:
+        for line in f:
+            kind, sep, rest = line.rstrip("\n").partition(" ")
+            if not rest:
+                continue
+            target = None
+            if kind == "obj":
+                # obj location md5 mtime
+                rest = rest.rsplit(" ", 2)[0]
+            elif kind == "sym":
+                # sym location -> target mtime
+                rest, sep, target = rest.rsplit(" ", 1)[0].partition(" -> ")
+            yield ENTRY_TYPES.get(kind, "other"), rest, target
+
+class OwnerMap(object):
+    """Map from installed paths to the packages owning them, read from the
+    CONTENTS files of installed repositories without going through
+    paludis. See putils.content.content_record() for the records returned.
+
+    After watch() it can be kept current with inotify: when fileno() is
+    readable, process_events() reads the CONTENTS of packages which were
+    installed and forgets those which were uninstalled."""
+
+    def __init__(self, repositories, root="/"):
+        self.repositories = repositories
+        self.root = root
+        self.inotify = None
+        self.watches = dict()
+        self.watched = dict()
+        # Package directory -> (package id string, [ (path, type, target) ])
+        self.packages = dict()
+        # Path -> { package directory : (type, target) }
+        self.owners = dict()
+        # Basename -> set of paths
+        self.basenames = dict()
+
+    #{{{Loading
+    def _package_name(self, package_dir, repository):
+        """Return the package id string of the package in package_dir like
+        paludis formats it."""
+        category_dir, pf = os.path.split(package_dir)
+        name = "%s/%s" % (os.path.basename(category_dir), pf)
+        try:
+            with open(os.path.join(package_dir, "SLOT")) as f:
+                slot = f.read().strip()
+        except IOError:
+            slot = ""
+        if slot:
+            name += ":" + slot
+        return "%s::%s" % (name, repository)
+
+    def _remove(self, package_dir):
+        package = self.packages.pop(package_dir, None)
+        if package is None:
+            return
+        for path, entry_type, target in package[1]:
+            owners = self.owners.get(path)
+            if owners is None:
+                continue
+            owners.pop(package_dir, None)
+            if not owners:
+                del self.owners[path]
+                basename = os.path.basename(path)
+                paths = self.basenames.get(basename)
+                if paths is not None:
+                    paths.discard(path)
+                    if not paths:
+                        del self.basenames[basename]
+
+    def refresh(self, package_dir, repository):
+        """Read the CONTENTS of the package in package_dir again, or forget
+        the package if it is no longer installed."""
+        self._remove(package_dir)
+        if os.path.basename(package_dir)[:1] in ("-", "."):
+            # Temporary directory of a merge in progress
+            return
+        if os.path.isdir(package_dir):
+            # CONTENTS may be written after the directory is created
+            self._watch("package", package_dir, repository)
+        try:
+            entries = [ (rootjoin(location, self.root), entry_type, target)
+                    for entry_type, location, target in
+                    parse_contents(os.path.join(package_dir, "CONTENTS")) ]
+        except IOError:
+            return
+
+        self.packages[package_dir] = (self._package_name(package_dir,
+            repository), entries)
+        for path, entry_type, target in entries:
+            owners = self.owners.get(path)
+            if owners is None:
+                owners = self.owners[path] = dict()
+                basename = os.path.basename(path)
+                if basename != path:
+                    self.basenames.setdefault(basename, set()).add(path)
+            owners[package_dir] = (entry_type, target)
+
+    def _load_category(self, category_dir, repository):
+        self._watch("category", category_dir, repository)
+        try:
+            names = os.listdir(category_dir)
+        except OSError:
+            return
+        for name in names:
+            self.refresh(os.path.join(category_dir, name), repository)
+
+    def _forget_category(self, category_dir):
+        prefix = category_dir + os.sep
+        for package_dir in [ package_dir for package_dir in self.packages
+                if package_dir.startswith(prefix) ]:
+            self._remove(package_dir)
+
+    def load(self):
+        """Read the CONTENTS of all installed packages."""
+        self.packages.clear()
+        self.owners.clear()
+        self.basenames.clear()
+        for repository, location in self.repositories:
+            self._watch("repository", location, repository)
+            try:
+                categories = os.listdir(location)
+            except OSError:
+                continue
+            for category in categories:
+                category_dir = os.path.join(location, category)
+                if os.path.isdir(category_dir):
+                    self._load_category(category_dir, repository)
+    #}}}
+
+    #{{{Watching
+    def watch(self):
+        """Watch installed repositories for changes with inotify.
+        Call before load(). Raises OSError if inotify isn't available."""
+        from putils.inotify import Inotify
+        self.inotify = Inotify()
+        self.watches.clear()
+        self.watched.clear()
+
+    def _watch(self, kind, path, repository):
+        """Watch path, which is a repository, category or package
+        directory."""
+        if self.inotify is None or path in self.watched:
+            return
+        if kind == "package":
+            mask = PACKAGE_MASK
+        else:
+            mask = DIRECTORY_MASK
+        try:
+            wd = self.inotify.add_watch(path, mask)
+        except OSError:
+            return
+        self.watches[wd] = (kind, path, repository)
+        self.watched[path] = wd
+
+    def fileno(self):
+        return self.inotify.fileno()
+
+    def process_events(self):
+        """Apply pending changes of installed repositories.
+        Returns the number of events processed."""
+        events = self.inotify.read()
+        for wd, mask, cookie, name in events:
+            if mask & IN_Q_OVERFLOW:
+                # Events were lost
+                self.load()
+                continue
+            if mask & IN_IGNORED:
+                # The directory is gone, it may have been created again
+                watch = self.watches.pop(wd, None)
+                if watch is not None and self.watched.get(watch[1]) == wd:
+                    del self.watched[watch[1]]
+                continue
+
+            watch = self.watches.get(wd)
+            if watch is None or not name:
+                continue
+            kind, path, repository = watch
+            if kind == "repository":
+                if mask & IN_ISDIR:
+                    category_dir = os.path.join(path, name)
+                    self._forget_category(category_dir)
+                    if os.path.isdir(category_dir):
+                        self._load_category(category_dir, repository)
+            elif kind == "category":
+                # A package was installed or uninstalled
+                self.refresh(os.path.join(path, name), repository)
+            elif name == "CONTENTS":
+                self.refresh(path, repository)
+        return len(events)
+
+    def close(self):
+        if self.inotify is not None:
+            self.inotify.close()
+            self.inotify = None
+    #}}}
+
+    def lookup(self, pattern, matcher="exact", ignore_case=False,
+            type_names=None):
+        """Return a sorted list of (package id string, type, path, target)
+        records of installed paths matching pattern, see
+        putils.pattern.path_matcher(). type_names limits the records to
+        these types, see putils.content.content_type_names()."""
+        if matcher == "exact":
+            paths = set(self.basenames.get(pattern, ()))
+            if pattern in self.owners:
+                paths.add(pattern)
+        else:
+            match = path_matcher(pattern, matcher, ignore_case)
+            paths = [ path for path in self.owners if match(path) ]
+
+        records = []
+        for path in paths:
+            for package_dir, (entry_type, target) in \
+                    self.owners[path].iteritems():
+                if type_names is None or entry_type in type_names or \
+                        "object" in type_names:
+                    records.append((self.packages[package_dir][0],
+                        entry_type, path, target))
+        records.sort()
+        return records
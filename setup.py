@@ -25,6 +25,7 @@ import sys
 
 from distutils import log
 from distutils.core import setup
+from distutils.command.build_py import build_py
 from distutils.command.install_scripts import install_scripts
 
 sys.path.insert(0, os.path.realpath(os.path.abspath(__file__)))
@@ -34,6 +35,27 @@ import putils.applets
 applets = putils.applets.__all__
 VIRTUAL_APPLET = "p"
 
+class manifest_build_py(build_py, object):
+
+    def run(self):
+        super(manifest_build_py, self).run()
+
+        global applets
+
+        # Applet names and usage strings, so p --help doesn't have to import
+        # every applet.
+        manifest = os.path.join(self.build_lib, "putils", "applets",
+                "manifest.py")
+        log.info("Generating " + manifest)
+        usages = [ (applet, putils.applets.scan_usage(
+            os.path.join("putils", "applets", applet + ".py")))
+            for applet in applets ]
+        if not self.dry_run:
+            f = open(manifest, "w")
+            f.write("# Generated by setup.py, do not edit.\n")
+            f.write("APPLETS = " + repr(usages) + "\n")
+            f.close()
+
 class symlinking_install_scripts(install_scripts, object):
 
     def run(self):
@@ -67,7 +89,10 @@ setup(name = putils.__name__,
         url = "http://hawking.nonlogic.org/projects/paludis-utils",
         packages = [ "putils", "putils/applets" ],
         scripts = [ "scripts/" + VIRTUAL_APPLET, ],
-        cmdclass = { "install_scripts" : symlinking_install_scripts },
+        data_files = [ ("share/bash-completion/completions",
+            [ "completion/bash/" + VIRTUAL_APPLET ]) ],
+        cmdclass = { "build_py" : manifest_build_py,
+            "install_scripts" : symlinking_install_scripts },
         classifiers = [ "Development Status :: 3 - Alpha",
             "Environment :: Console",
             "Intended Audience :: End Users/Desktop",